@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,8 +45,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',  # feeds /metrics/; off with METRICS_ENABLED=False
+    'core.middleware.ProfilingMiddleware',  # no-op unless PROFILING_ENABLED
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise for static files
+    'core.middleware.AsyncWhiteNoiseMiddleware',  # WhiteNoise for static files, async-capable for ASGI
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -55,9 +59,13 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'config.urls'
 
+TEST_RUNNER = 'config.test_runner.TestRunner'
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django templates, with render time reported to core.middleware.ProfilingMiddleware
+        'BACKEND': 'core.profiling.DjangoTemplates',
+        'NAME': 'django',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -83,16 +91,183 @@ if os.environ.get('DATABASE_URL'):
     DATABASES = {
         'default': dj_database_url.parse(os.environ.get('DATABASE_URL'))
     }
+    # Connection management (DB_CONN_MODE):
+    #   persistent - each worker thread keeps its connection for
+    #                DB_CONN_MAX_AGE seconds and pings it before reuse
+    #   pool       - a psycopg 3 pool per worker process (Django 5.1+, the
+    #                default on PostgreSQL); needed under ASGI, where every
+    #                request runs its sync code in a fresh thread and
+    #                persistent connections pile up
+    #   none       - a new connection per request (Django's default)
+    # Pools are sized so that WEB_CONCURRENCY workers together stay within
+    # DB_MAX_CONNECTIONS, minus DB_RESERVED_CONNECTIONS kept free for
+    # migrations, management commands and psql.
+    postgresql = DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'
+    DB_CONN_MODE = os.environ.get('DB_CONN_MODE', 'pool' if postgresql else 'persistent')
+    if DB_CONN_MODE == 'persistent':
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+        DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+    elif DB_CONN_MODE == 'pool' and postgresql:
+        workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+        available = int(os.environ.get('DB_MAX_CONNECTIONS', 20)) - int(os.environ.get('DB_RESERVED_CONNECTIONS', 3))
+        max_size = int(os.environ.get('DB_POOL_MAX_SIZE', 0)) or max(available // workers, 1)
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': min(int(os.environ.get('DB_POOL_MIN_SIZE', 2)), max_size),
+            'max_size': max_size,
+            # Seconds a request waits for a free connection before failing
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            # Recycle connections so server-side memory does not creep up
+            'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+        }
+        # Makes the pool ping connections on checkout
+        DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+    elif DB_CONN_MODE not in ('pool', 'none'):
+        raise ImproperlyConfigured(f'DB_CONN_MODE must be persistent, pool or none, not {DB_CONN_MODE!r}')
 else:
     # Development database configuration
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Background refreshes write from their own threads; take the
+                # write lock up front so concurrent writers wait instead of
+                # failing with "database is locked"
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
         }
     }
 
 
+# Sessions and flash messages. The todo views flash a message after every
+# write; with MESSAGE_MODE=cookie it travels in a signed cookie and the
+# session is never touched. MESSAGE_MODE=fallback (Django's default) spills
+# messages over ~2KB into the session; MESSAGE_MODE=session always stores
+# them there.
+# Only the admin needs sessions. SESSION_MODE=cached_db serves them from the
+# cache and writes through to django_session; signed_cookies keeps them
+# client-side with no table at all; db is Django's default.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+MESSAGE_STORAGES = {
+    'cookie': 'django.contrib.messages.storage.cookie.CookieStorage',
+    'fallback': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    'session': 'django.contrib.messages.storage.session.SessionStorage',
+}
+SESSION_MODE = os.environ.get('SESSION_MODE', 'cached_db')
+MESSAGE_MODE = os.environ.get('MESSAGE_MODE', 'cookie')
+if SESSION_MODE not in SESSION_ENGINES:
+    raise ImproperlyConfigured(f'SESSION_MODE must be one of {", ".join(SESSION_ENGINES)}, not {SESSION_MODE!r}')
+if MESSAGE_MODE not in MESSAGE_STORAGES:
+    raise ImproperlyConfigured(f'MESSAGE_MODE must be one of {", ".join(MESSAGE_STORAGES)}, not {MESSAGE_MODE!r}')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+MESSAGE_STORAGE = MESSAGE_STORAGES[MESSAGE_MODE]
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Redis when REDIS_URL is set (requires the `redis` package), a shared directory
+# when CACHE_DIR is set, per-process memory otherwise
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+elif os.environ.get('CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'site-django',
+        }
+    }
+
+# LeetCode GraphQL response caching (seconds). The daily question is always
+# cached until 00:00 UTC, when LeetCode rolls it over.
+LEETCODE_CACHE_ALIAS = 'default'
+LEETCODE_RECENT_TTL = int(os.environ.get('LEETCODE_RECENT_TTL', 60 * 60))
+LEETCODE_QUESTION_TTL = int(os.environ.get('LEETCODE_QUESTION_TTL', 6 * 60 * 60))
+# Expired payloads are kept this much longer and served while being refreshed
+LEETCODE_STALE_TTL = int(os.environ.get('LEETCODE_STALE_TTL', 7 * 24 * 60 * 60))
+# Rendered question bodies are keyed by content hash, so they only need evicting for space
+LEETCODE_RENDER_TTL = int(os.environ.get('LEETCODE_RENDER_TTL', 7 * 24 * 60 * 60))
+# Stop calling leetcode.com for a cool-down after this many consecutive failures
+LEETCODE_BREAKER_THRESHOLD = int(os.environ.get('LEETCODE_BREAKER_THRESHOLD', 5))
+LEETCODE_BREAKER_COOLDOWN = int(os.environ.get('LEETCODE_BREAKER_COOLDOWN', 60))
+# How long other workers wait on (and the cache lock protects) one in-flight fetch
+LEETCODE_SINGLEFLIGHT_TIMEOUT = int(os.environ.get('LEETCODE_SINGLEFLIGHT_TIMEOUT', 15))
+# Request budget for leetcode.com (token bucket in the cache; 0 = unlimited),
+# retries included. A call waits up to LEETCODE_RATE_WAIT seconds for a token
+# before failing as unavailable. With REDIS_URL it holds across all workers
+# and instances; with the per-process cache each worker gets a
+# 1/WEB_CONCURRENCY share, so it holds per instance.
+LEETCODE_RATE_LIMIT = float(os.environ.get('LEETCODE_RATE_LIMIT', 2))
+LEETCODE_RATE_BURST = int(os.environ.get('LEETCODE_RATE_BURST', 20))
+LEETCODE_RATE_WAIT = float(os.environ.get('LEETCODE_RATE_WAIT', 2))
+# Slugs LeetCode reported as missing are not asked for again for this long (0 = off)
+LEETCODE_NOT_FOUND_TTL = int(os.environ.get('LEETCODE_NOT_FOUND_TTL', 60 * 60))
+# Question pages per client IP: requests per second on average, and burst
+LEETCODE_DETAIL_IP_RATE = float(os.environ.get('LEETCODE_DETAIL_IP_RATE', 1))
+LEETCODE_DETAIL_IP_BURST = int(os.environ.get('LEETCODE_DETAIL_IP_BURST', 30))
+# request.META key holding the client address when behind a proxy, e.g.
+# HTTP_X_FORWARDED_FOR (its last entry is used); empty = REMOTE_ADDR
+CLIENT_IP_HEADER = os.environ.get('CLIENT_IP_HEADER', '')
+
+# Outbound HTTP client for the LeetCode GraphQL API (one pooled session per process,
+# one httpx.AsyncClient per event loop for the async views)
+LEETCODE_GRAPHQL_URL = os.environ.get('LEETCODE_GRAPHQL_URL', 'https://leetcode.com/graphql/')
+LEETCODE_ASYNC_POOL_SIZE = int(os.environ.get('LEETCODE_ASYNC_POOL_SIZE', 100))
+LEETCODE_HTTP_POOL_SIZE = int(os.environ.get('LEETCODE_HTTP_POOL_SIZE', 10))
+LEETCODE_CONNECT_TIMEOUT = float(os.environ.get('LEETCODE_CONNECT_TIMEOUT', 3.05))
+LEETCODE_READ_TIMEOUT = float(os.environ.get('LEETCODE_READ_TIMEOUT', 10))
+LEETCODE_MAX_RETRIES = int(os.environ.get('LEETCODE_MAX_RETRIES', 2))
+LEETCODE_RETRY_BACKOFF = float(os.environ.get('LEETCODE_RETRY_BACKOFF', 0.5))
+
+# Rendered todo cards and list pages (invalidated by Todo signals, see core/fragments.py)
+FRAGMENT_CACHE_ALIAS = 'default'
+FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL', 24 * 60 * 60))
+
+# Request profiling: Server-Timing header and a JSON log line per request.
+# Requests slower than PROFILING_DUMP_THRESHOLD_MS (0 = never) also get a
+# cProfile dump in PROFILING_DUMP_DIR; setting it profiles every request.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'False').lower() == 'true'
+PROFILING_DUMP_THRESHOLD_MS = int(os.environ.get('PROFILING_DUMP_THRESHOLD_MS', 0))
+PROFILING_DUMP_DIR = os.environ.get('PROFILING_DUMP_DIR', str(BASE_DIR / 'profiles'))
+
+# /metrics/ (Prometheus text format). With METRICS_DIR set, each gunicorn
+# worker writes its counters there every METRICS_FLUSH_INTERVAL seconds and a
+# scrape sums all workers; it must be a directory private to this instance.
+# Scrapes need "Authorization: Bearer <METRICS_TOKEN>"; without a token the
+# endpoint answers 404 (counters are still collected).
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Todo list pagination (rows per page; ?per_page= is capped at the maximum)
+TODO_PAGE_SIZE = int(os.environ.get('TODO_PAGE_SIZE', 50))
+TODO_MAX_PAGE_SIZE = int(os.environ.get('TODO_MAX_PAGE_SIZE', 200))
+# Operations accepted per /todos/bulk/ request
+TODO_BULK_MAX_ITEMS = int(os.environ.get('TODO_BULK_MAX_ITEMS', 1000))
+# Rows fetched per database round trip when streaming /api/todos/
+TODO_API_CHUNK_SIZE = int(os.environ.get('TODO_API_CHUNK_SIZE', 500))
+# Bearer token for JSON API clients (/api/todos/, /todos/bulk/), which send no
+# CSRF token; empty = only same-site requests with a CSRF token are accepted
+TODO_API_TOKEN = os.environ.get('TODO_API_TOKEN', '')
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -135,7 +310,20 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 # WhiteNoise configuration for static files
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# collectstatic writes content-hashed copies plus .gz and .br (Brotli)
+# versions; WhiteNoise serves hashed names with a far-future, immutable
+# Cache-Control. (STATICFILES_STORAGE is ignored since Django 5.1.)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
+
+# Mixed into page ETags (with the static manifest hash) so a deploy
+# invalidates pages browsers revalidate; e.g. the commit being deployed.
+# Without the variable, the RELEASE_VERSION file the build writes is used.
+RELEASE_VERSION = os.environ.get('RELEASE_VERSION', '')
+if not RELEASE_VERSION and (BASE_DIR / 'RELEASE_VERSION').is_file():
+    RELEASE_VERSION = (BASE_DIR / 'RELEASE_VERSION').read_text().strip()
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -180,5 +368,11 @@ LOGGING = {
         'handlers': ['console'],
         'level': 'INFO',
     },
+    'loggers': {
+        # httpx logs every outbound request at INFO
+        'httpx': {
+            'level': 'WARNING',
+        },
+    },
 }
 
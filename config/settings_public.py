@@ -0,0 +1,33 @@
+"""
+Settings for serving only the public site: DJANGO_SETTINGS_MODULE=config.settings_public
+
+Nothing the site serves uses users, sessions or the admin, so this profile
+leaves out the admin, auth, contenttypes and sessions apps and their
+middleware. Workers import less at start-up and need less memory. Flash
+messages are kept in a signed cookie instead of the session. Run
+migrations and admin tasks with config.settings.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+UNUSED_APPS = (
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+)
+UNUSED_MIDDLEWARE = (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+)
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in UNUSED_APPS]
+MIDDLEWARE = [name for name in MIDDLEWARE if name not in UNUSED_MIDDLEWARE]
+TEMPLATES[0]['OPTIONS']['context_processors'] = [
+    processor for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+    if processor != 'django.contrib.auth.context_processors.auth'
+]
+AUTH_PASSWORD_VALIDATORS = []
+
+# Whatever MESSAGE_MODE says: there is no session to fall back to
+MESSAGE_STORAGE = MESSAGE_STORAGES['cookie']
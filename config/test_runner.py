@@ -0,0 +1,22 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Run tests against unhashed static files.
+
+    The manifest storage used in production needs collectstatic output to
+    resolve {% static %}; tests render templates without building it.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._static_override = override_settings(STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        })
+        self._static_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._static_override.disable()
+        super().teardown_test_environment(**kwargs)
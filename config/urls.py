@@ -1,4 +1,4 @@
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 from django.http import JsonResponse
 
@@ -8,6 +8,11 @@ def health_check(request):
 
 urlpatterns = [
     path('', include('core.urls')),
-    path('admin/', admin.site.urls),
     path('health/', health_check, name='health_check'),
 ]
+
+# Not installed under config.settings_public
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns.append(path('admin/', admin.site.urls))
@@ -0,0 +1,158 @@
+"""
+JSON API for todos.
+
+GET /api/todos/ streams every matching todo (same filters as the list
+page) without loading the table into memory; the other endpoints work on
+one todo at a time and reuse the validation in core.todos.
+
+Clients authenticate with "Authorization: Bearer <TODO_API_TOKEN>" instead
+of a CSRF token (see token_or_csrf()).
+"""
+
+import hmac
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_http_methods
+
+from . import todos
+from .models import Todo
+
+encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+
+def serialize(todo):
+    return {field: getattr(todo, field) for field in todos.FIELDS}
+
+
+def _error(message, status, **extra):
+    return JsonResponse({'error': message, **extra}, status=status)
+
+
+def _read_json(request):
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def token_or_csrf(view):
+    """Accept the API token in place of a CSRF token.
+
+    Requests with an Authorization header must carry TODO_API_TOKEN (401
+    otherwise, or if no token is configured); requests without one go
+    through the CSRF check like any form post from the site.
+    """
+    protected = csrf_protect(view)
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        authorization = request.headers.get('Authorization')
+        if authorization is None:
+            return protected(request, *args, **kwargs)
+        expected = f'Bearer {settings.TODO_API_TOKEN}'
+        if not settings.TODO_API_TOKEN or not hmac.compare_digest(authorization, expected):
+            response = _error('invalid API token', 401)
+            response['WWW-Authenticate'] = 'Bearer'
+            return response
+        return view(request, *args, **kwargs)
+
+    return csrf_exempt(wrapped)
+
+
+async def _aiter(pieces):
+    """Drive a sync iterator that queries the database from the event loop.
+
+    Each step runs in the request's thread-sensitive thread, where the view
+    itself ran, so the cursor stays on its connection.
+    """
+    pieces = iter(pieces)
+    done = object()
+    step = sync_to_async(next)
+    try:
+        while (piece := await step(pieces, done)) is not done:
+            yield piece
+    finally:
+        if hasattr(pieces, 'close'):
+            await sync_to_async(pieces.close)()
+
+
+def streaming_response(request, pieces, content_type):
+    """StreamingHttpResponse that streams under both WSGI and ASGI.
+
+    Under ASGI Django reads a sync iterator into a list before sending it,
+    so there it gets an async iterator instead.
+    """
+    if isinstance(request, ASGIRequest):
+        pieces = _aiter(pieces)
+    return StreamingHttpResponse(pieces, content_type=content_type)
+
+
+def stream_json_list(rows, chunk_size):
+    """Yield {"results": [...]} in pieces of about chunk_size rows"""
+    yield '{"results":['
+    buffer = []
+    first = True
+    for row in rows:
+        buffer.append(encoder.encode(row))
+        if len(buffer) >= chunk_size:
+            yield ('' if first else ',') + ','.join(buffer)
+            buffer, first = [], False
+    if buffer:
+        yield ('' if first else ',') + ','.join(buffer)
+    yield ']}'
+
+
+@require_http_methods(['GET', 'POST'])
+@token_or_csrf
+def todo_collection(request):
+    if request.method == 'POST':
+        data = _read_json(request)
+        if data is None:
+            return _error('body must be a JSON object', 400)
+        fields, errors = todos.clean_todo(data)
+        if errors:
+            return _error('invalid todo', 400, errors=errors)
+        return JsonResponse(serialize(Todo.objects.create(**fields)), status=201)
+
+    queryset, _ = todos.filter_todos(Todo.objects.all(), request.GET)
+    chunk_size = settings.TODO_API_CHUNK_SIZE
+    # values() + iterator() keeps only one chunk of rows in memory at a time
+    rows = queryset.order_by('-created_at', '-id').values(*todos.FIELDS).iterator(chunk_size=chunk_size)
+    return streaming_response(request, stream_json_list(rows, chunk_size), 'application/json')
+
+
+@require_http_methods(['GET', 'PUT', 'PATCH', 'DELETE'])
+@token_or_csrf
+def todo_item(request, pk):
+    todo = Todo.objects.filter(pk=pk).first()
+    if todo is None:
+        return _error('not found', 404)
+
+    if request.method == 'GET':
+        return JsonResponse(serialize(todo))
+
+    if request.method == 'DELETE':
+        todo.delete()
+        return HttpResponse(status=204)
+
+    data = _read_json(request)
+    if data is None:
+        return _error('body must be a JSON object', 400)
+    if request.method == 'PATCH':
+        # Fill in the fields that were not sent from the current row
+        data = {**serialize(todo), 'due_date': todo.due_date and todo.due_date.isoformat(), **data}
+    fields, errors = todos.clean_todo(data)
+    if errors:
+        return _error('invalid todo', 400, errors=errors)
+    for name, value in fields.items():
+        setattr(todo, name, value)
+    todo.save()
+    return JsonResponse(serialize(todo))
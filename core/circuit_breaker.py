@@ -0,0 +1,70 @@
+import logging
+import time
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Stop calling a failing upstream for a cool-down period.
+
+    State lives in the Django cache so every worker shares it. After
+    `failure_threshold` consecutive failures the breaker opens and allow()
+    returns False for `cooldown` seconds. The first call after that is a
+    trial: success closes the breaker, failure opens it again right away.
+    """
+
+    def __init__(self, name, failure_threshold=5, cooldown=60, cache_alias='default'):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.cache_alias = cache_alias
+        self.failures_key = f'breaker:{name}:failures'
+        self.open_key = f'breaker:{name}:open_until'
+        self.tripped_key = f'breaker:{name}:tripped'
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def allow(self):
+        return self.retry_after() == 0
+
+    def retry_after(self):
+        """Seconds until calls are allowed again (0 when closed or half-open)"""
+        open_until = self.cache.get(self.open_key)
+        if open_until is None:
+            return 0
+        return max(int(open_until - time.time()) + 1, 0) if open_until > time.time() else 0
+
+    def record_success(self):
+        if self.cache.get(self.tripped_key) or self.cache.get(self.failures_key):
+            self.cache.delete_many([self.failures_key, self.open_key, self.tripped_key])
+            logger.info('Circuit %s closed', self.name)
+
+    def record_failure(self):
+        cache = self.cache
+        if cache.get(self.tripped_key):
+            # Failed trial call after the cool-down: open again immediately
+            self._open()
+            return
+        try:
+            failures = cache.incr(self.failures_key)
+        except ValueError:
+            cache.add(self.failures_key, 0, timeout=self.cooldown * 10)
+            failures = cache.incr(self.failures_key)
+        if failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        cache = self.cache
+        cache.set(self.open_key, time.time() + self.cooldown, timeout=self.cooldown)
+        cache.set(self.tripped_key, True, timeout=None)
+        cache.delete(self.failures_key)
+        logger.warning('Circuit %s open for %ss', self.name, self.cooldown)
+
+    def state(self):
+        if not self.allow():
+            return 'open'
+        return 'half-open' if self.cache.get(self.tripped_key) else 'closed'
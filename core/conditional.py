@@ -0,0 +1,72 @@
+"""
+ETag validators for the todo and LeetCode pages.
+
+ETags are computed from data the view has to load anyway (a single
+aggregate for todos, the cached payload for LeetCode), so a matching
+If-None-Match is answered with a 304 before any template is rendered. Responses carry Cache-Control: no-cache so browsers
+and the CDN revalidate instead of guessing a freshness lifetime. Every
+ETag also names the release (see release()), so pages cached before a
+deploy are not revalidated against new templates and asset names.
+
+No Last-Modified is sent: neither a deleted todo nor a deploy moves any
+timestamp forward, so If-Modified-Since would keep answering 304 after
+the page changed.
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from .models import Todo
+
+
+def payload_hash(value):
+    payload = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+
+def release():
+    """RELEASE_VERSION plus the hash of the collectstatic manifest, if any"""
+    manifest_hash = getattr(staticfiles_storage, 'manifest_hash', '')
+    return '-'.join(part for part in (settings.RELEASE_VERSION, manifest_hash) if part) or 'dev'
+
+
+def not_modified(request, etag):
+    """A 304 response if the request's If-None-Match matches, else None"""
+    response = get_conditional_response(request, etag=quote_etag(etag))
+    if response is not None:
+        set_etag(response, etag)
+    return response
+
+
+def set_etag(response, etag):
+    response.headers.setdefault('ETag', quote_etag(etag))
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def leetcode_etag(result, *parts):
+    """ETag for a leetcode Cached result.
+
+    It covers the payload and whether the stale notice is shown, so a
+    refresh that brings back identical data still revalidates.
+    """
+    return '-'.join([payload_hash(result.value), 'stale' if result.stale else 'fresh', *parts, release()])
+
+
+def todo_etag(request):
+    """ETag for the todo list, from max(updated_at) and the row count, or None.
+
+    Pages showing flash messages are one-offs and get no ETag.
+    """
+    if len(messages.get_messages(request)):
+        return None
+    state = Todo.objects.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    version = state['last_modified'].timestamp() if state['last_modified'] else 0
+    return f'todos-{version}-{state["count"]}-{release()}'
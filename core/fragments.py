@@ -0,0 +1,101 @@
+"""
+Cached HTML fragments for the todo list.
+
+Each todo card is cached under (id, updated_at), so a save only re-renders
+that card; a page of cards is fetched with one get_many(). The whole list
+region is cached on top of that, keyed by a version number that Todo
+signals bump (see core.signals) plus the page's query string.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+KEY_PREFIX = 'fragment'
+STATS_PREFIX = 'fragment:stats'
+TODO_VERSION_KEY = f'{KEY_PREFIX}:todo:version'
+NAMES = ('todo_list', 'todo_card')
+
+
+def get_cache():
+    return caches[settings.FRAGMENT_CACHE_ALIAS]
+
+
+def _count(name, event, amount=1):
+    if not amount:
+        return
+    cache = get_cache()
+    key = f'{STATS_PREFIX}:{event}:{name}'
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        if not cache.add(key, amount, timeout=None):
+            cache.incr(key, amount)
+
+
+def todo_version():
+    """Current version of the todo fragments (bumped on every Todo write)"""
+    cache = get_cache()
+    version = cache.get(TODO_VERSION_KEY)
+    if version is None:
+        cache.add(TODO_VERSION_KEY, 1, timeout=None)
+        version = cache.get(TODO_VERSION_KEY, 1)
+    return version
+
+
+def bump_todo_version():
+    cache = get_cache()
+    try:
+        cache.incr(TODO_VERSION_KEY)
+    except ValueError:
+        cache.add(TODO_VERSION_KEY, 2, timeout=None)
+
+
+def cached(name, parts, render):
+    """Return the fragment stored for `parts`, calling render() on a miss"""
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    cache = get_cache()
+    key = f'{KEY_PREFIX}:{name}:{digest}'
+    html = cache.get(key)
+    if html is None:
+        _count(name, 'misses')
+        html = render()
+        cache.set(key, html, timeout=settings.FRAGMENT_CACHE_TTL)
+    else:
+        _count(name, 'hits')
+    return mark_safe(html)
+
+
+def _card_key(todo):
+    return f'{KEY_PREFIX}:todo_card:{todo.pk}:{todo.updated_at.timestamp()}'
+
+
+def todo_cards(todos):
+    """Rendered cards for a list of todos, in order"""
+    cache = get_cache()
+    keys = [_card_key(todo) for todo in todos]
+    found = cache.get_many(keys)
+    missing = {}
+    for key, todo in zip(keys, todos):
+        if key not in found:
+            missing[key] = render_to_string('core/todo_card.html', {'todo': todo})
+    if missing:
+        cache.set_many(missing, timeout=settings.FRAGMENT_CACHE_TTL)
+    _count('todo_card', 'hits', len(keys) - len(missing))
+    _count('todo_card', 'misses', len(missing))
+    return [mark_safe(found.get(key) or missing[key]) for key in keys]
+
+
+def stats():
+    """Hit/miss counters per fragment name"""
+    cache = get_cache()
+    result = {}
+    for name in NAMES:
+        counters = {event: cache.get(f'{STATS_PREFIX}:{event}:{name}', 0) for event in ('hits', 'misses')}
+        total = counters['hits'] + counters['misses']
+        counters['hit_rate'] = round(counters['hits'] / total, 3) if total else None
+        result[name] = counters
+    return result
@@ -0,0 +1,458 @@
+import calendar
+import re
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from . import leetcode_cache, leetcode_queries, profiling
+from .circuit_breaker import CircuitBreaker
+from .rate_limit import TokenBucket
+from .leetcode_cache import Cached
+from .leetcode_client import get_async_client, get_client, metrics
+from .metrics import RATE_LIMITED, UPSTREAM_ERRORS
+from .models import DailyChallenge, LeetCodeQuestion
+
+# GraphQL queries, selecting only the fields each template renders
+DAILY_QUESTION_QUERY = leetcode_queries.daily_question_query()
+RECENT_QUESTIONS_QUERY = leetcode_queries.month_challenges_query()
+QUESTION_CONTENT_QUERY = leetcode_queries.question_query()
+
+QUERY_NAMES = ('questionOfToday', 'recentDailyQuestions', 'questionContent')
+
+# Every LeetCode slug has this shape; anything else cannot exist upstream
+SLUG_RE = re.compile(r'[a-z0-9]+(?:-[a-z0-9]+)*')
+
+
+class LeetCodeError(Exception):
+    """Raised when the LeetCode API cannot provide the requested data"""
+
+
+class LeetCodeUnavailable(LeetCodeError):
+    """Raised without calling the API while the circuit breaker is open"""
+
+
+class LeetCodeRateLimited(LeetCodeUnavailable):
+    """Raised without calling the API when the request budget is used up"""
+
+
+def get_breaker():
+    return CircuitBreaker(
+        'leetcode',
+        failure_threshold=settings.LEETCODE_BREAKER_THRESHOLD,
+        cooldown=settings.LEETCODE_BREAKER_COOLDOWN,
+        cache_alias=settings.LEETCODE_CACHE_ALIAS,
+    )
+
+
+def get_limiter():
+    return TokenBucket(
+        'leetcode',
+        rate=settings.LEETCODE_RATE_LIMIT,
+        burst=settings.LEETCODE_RATE_BURST,
+        cache_alias=settings.LEETCODE_CACHE_ALIAS,
+    )
+
+
+def _rate_limited(query):
+    RATE_LIMITED.inc('leetcode')
+    UPSTREAM_ERRORS.inc(operation_name(query), 'rate_limited')
+    return LeetCodeRateLimited('Too many requests to LeetCode right now, try again shortly')
+
+
+def operation_name(query):
+    match = re.search(r'query\s+(\w+)', query)
+    return match.group(1) if match else 'graphql'
+
+
+def _payload(query, variables):
+    payload = {'query': query}
+    if variables is not None:
+        payload['variables'] = variables
+    return payload
+
+
+def _is_upstream_failure(status_code):
+    return status_code == 429 or status_code >= 500
+
+
+def _parse(response, operation):
+    if response.status_code != 200:
+        raise LeetCodeError(f'Failed to fetch data: {response.status_code}')
+
+    with profiling.timer('decode'):
+        data = response.json()
+    if 'errors' in data:
+        UPSTREAM_ERRORS.inc(operation, 'graphql')
+        raise LeetCodeError(f'API Error: {data["errors"]}')
+    return data.get('data') or {}
+
+
+def graphql(query, variables=None):
+    """POST a query to the LeetCode GraphQL endpoint and return its `data` member"""
+    breaker = get_breaker()
+    retry_after = breaker.retry_after()
+    if retry_after:
+        raise LeetCodeUnavailable(f'LeetCode is unavailable, retrying in {retry_after}s')
+    limiter = get_limiter()
+    if not limiter.acquire(settings.LEETCODE_RATE_WAIT):
+        raise _rate_limited(query)
+
+    client = get_client()
+    try:
+        response = client.post(_payload(query, variables), operation_name(query), limiter=limiter)
+    except client.errors as e:
+        breaker.record_failure()
+        raise LeetCodeError(f'Network error: {str(e)}')
+
+    if _is_upstream_failure(response.status_code):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return _parse(response, operation_name(query))
+
+
+async def agraphql(query, variables=None):
+    """Async version of graphql() using the per-loop httpx client"""
+    breaker = get_breaker()
+    retry_after = await sync_to_async(breaker.retry_after)()
+    if retry_after:
+        raise LeetCodeUnavailable(f'LeetCode is unavailable, retrying in {retry_after}s')
+    limiter = get_limiter()
+    if not await limiter.aacquire(settings.LEETCODE_RATE_WAIT):
+        raise _rate_limited(query)
+
+    client = await get_async_client()
+    try:
+        response = await client.post(_payload(query, variables), operation_name(query), limiter=limiter)
+    except client.errors as e:
+        await sync_to_async(breaker.record_failure)()
+        raise LeetCodeError(f'Network error: {str(e)}')
+
+    if _is_upstream_failure(response.status_code):
+        await sync_to_async(breaker.record_failure)()
+    else:
+        await sync_to_async(breaker.record_success)()
+    return _parse(response, operation_name(query))
+
+
+def _daily(data):
+    return data.get('activeDailyCodingChallengeQuestion') or None
+
+
+def _month(data):
+    return (data.get('dailyCodingChallengeV2') or {}).get('challenges') or None
+
+
+def _question(data):
+    return data.get('question') or None
+
+
+def _store_daily(daily):
+    if daily:
+        DailyChallenge.store_many([daily])
+    return daily
+
+
+def _store_month(challenges):
+    if challenges:
+        DailyChallenge.store_many(challenges)
+    return challenges
+
+
+def _store_question(question):
+    if question:
+        return LeetCodeQuestion.store(question).payload
+    return question
+
+
+def _fetch_daily():
+    return _store_daily(_daily(graphql(DAILY_QUESTION_QUERY)))
+
+
+async def _afetch_daily():
+    daily = _daily(await agraphql(DAILY_QUESTION_QUERY))
+    return await sync_to_async(_store_daily)(daily)
+
+
+def _latest_daily():
+    latest = DailyChallenge.objects.order_by('-date').first()
+    if latest:
+        return Cached(latest.as_challenge(), latest.fetched_at, True)
+    return None
+
+
+def _stored_daily(today):
+    """Today's DailyChallenge row as a fresh Cached, if it has what the daily page renders.
+
+    The daily question only changes at midnight, so the row stays fresh all
+    day; rows written by a month fetch alone lack the content.
+    """
+    stored = DailyChallenge.objects.filter(date=today).first()
+    if stored and 'content' in stored.question:
+        return Cached(stored.as_challenge(), stored.fetched_at, False)
+    return None
+
+
+def get_daily_challenge():
+    """Today's challenge as a Cached, cached until the question rolls over at UTC midnight.
+
+    Reads today's DailyChallenge row first, so whatever stored it (another
+    worker, prefetch_leetcode) saves the API call. If the API fails, the
+    most recent stored challenge is returned as stale.
+    """
+    today = timezone.now().date().isoformat()
+    stored = _stored_daily(today)
+    if stored:
+        return stored
+    try:
+        return leetcode_cache.get_or_fetch(
+            'questionOfToday', {'date': today}, _fetch_daily,
+            timeout=leetcode_cache.seconds_until_utc_midnight(),
+        )
+    except LeetCodeError:
+        latest = _latest_daily()
+        if latest:
+            return latest
+        raise
+
+
+async def aget_daily_challenge():
+    today = timezone.now().date().isoformat()
+    stored = await sync_to_async(_stored_daily)(today)
+    if stored:
+        return stored
+    try:
+        return await leetcode_cache.aget_or_fetch(
+            'questionOfToday', {'date': today}, _afetch_daily,
+            timeout=leetcode_cache.seconds_until_utc_midnight(),
+            sync_fetch=_fetch_daily,
+        )
+    except LeetCodeError:
+        latest = await sync_to_async(_latest_daily)()
+        if latest:
+            return latest
+        raise
+
+
+def _month_fetcher(variables):
+    return lambda: _store_month(_month(graphql(RECENT_QUESTIONS_QUERY, variables)))
+
+
+def _days_published(year, month):
+    """How many daily challenges the month has so far (one per day up to today, UTC)"""
+    today = timezone.now().date()
+    if (year, month) == (today.year, today.month):
+        return today.day
+    if (year, month) > (today.year, today.month):
+        return 0
+    return calendar.monthrange(year, month)[1]
+
+
+def _stored_month(year, month):
+    """The month's DailyChallenge rows as a Cached, or None if there are none.
+
+    Freshness comes from the oldest row: a month fetch rewrites every row,
+    while fetching the daily question only touches today's.
+    """
+    stored = list(DailyChallenge.objects.filter(date__year=year, date__month=month))
+    if not stored:
+        return None
+    fetched_at = min(c.fetched_at for c in stored)
+    stale = timezone.now() - fetched_at >= timedelta(seconds=settings.LEETCODE_RECENT_TTL)
+    return Cached([c.as_challenge() for c in stored], fetched_at, stale)
+
+
+def _is_complete(stored, year, month):
+    return stored is not None and len(stored.value) >= _days_published(year, month)
+
+
+def _latest_challenges(count=5):
+    """Most recent stored challenges from any month, newest first"""
+    latest = list(DailyChallenge.objects.order_by('-date')[:count])
+    if not latest:
+        return None
+    return Cached([c.as_challenge() for c in latest], min(c.fetched_at for c in latest), True)
+
+
+def refresh_month_challenges(year, month):
+    """Fetch the month from the API now and store it as DailyChallenge rows"""
+    variables = {'year': year, 'month': month}
+    return leetcode_cache.refresh(
+        'recentDailyQuestions', variables, _month_fetcher(variables),
+        timeout=settings.LEETCODE_RECENT_TTL,
+    )
+
+
+def get_month_challenges(year, month, wait=False):
+    """All daily challenges for the given month as a Cached.
+
+    Reads DailyChallenge rows first. Rows older than LEETCODE_RECENT_TTL are
+    served as stale while a background refresh runs (or refreshed in place
+    with wait=True). A month with missing days waits for the API, whose
+    response is cached for LEETCODE_RECENT_TTL so a month that also has gaps
+    upstream is not refetched on every request. If the API fails, the stored
+    rows (or the most recent challenges) are served as stale.
+    """
+    variables = {'year': year, 'month': month}
+    stored = _stored_month(year, month)
+    if _is_complete(stored, year, month):
+        if not stored.stale:
+            return stored
+        if not wait:
+            leetcode_cache.refresh_in_background(
+                'recentDailyQuestions', variables, _month_fetcher(variables),
+                timeout=settings.LEETCODE_RECENT_TTL,
+            )
+            return stored
+
+    try:
+        if wait:
+            return refresh_month_challenges(year, month)
+        return leetcode_cache.get_or_fetch(
+            'recentDailyQuestions', variables, _month_fetcher(variables),
+            timeout=settings.LEETCODE_RECENT_TTL,
+        )
+    except LeetCodeError:
+        fallback = stored or _latest_challenges()
+        if fallback:
+            return fallback._replace(stale=True)
+        raise
+
+
+async def aget_month_challenges(year, month):
+    variables = {'year': year, 'month': month}
+    stored = await sync_to_async(_stored_month)(year, month)
+    if _is_complete(stored, year, month):
+        if not stored.stale:
+            return stored
+        await sync_to_async(leetcode_cache.refresh_in_background)(
+            'recentDailyQuestions', variables, _month_fetcher(variables),
+            timeout=settings.LEETCODE_RECENT_TTL,
+        )
+        return stored
+
+    async def fetch():
+        challenges = _month(await agraphql(RECENT_QUESTIONS_QUERY, variables))
+        return await sync_to_async(_store_month)(challenges)
+
+    try:
+        return await leetcode_cache.aget_or_fetch(
+            'recentDailyQuestions', variables, fetch,
+            timeout=settings.LEETCODE_RECENT_TTL,
+            sync_fetch=_month_fetcher(variables),
+        )
+    except LeetCodeError:
+        fallback = stored or await sync_to_async(_latest_challenges)()
+        if fallback:
+            return fallback._replace(stale=True)
+        raise
+
+
+def fetch_question(title_slug):
+    """Full question payload straight from the API (coalesced and cached), or None if it does not exist"""
+    variables = {'titleSlug': title_slug}
+    return leetcode_cache.refresh(
+        'questionContent', variables,
+        lambda: _question(graphql(QUESTION_CONTENT_QUERY, variables)),
+        timeout=settings.LEETCODE_QUESTION_TTL,
+    ).value
+
+
+def fetch_questions(title_slugs):
+    """Several question payloads in one aliased API call, as {slug: payload}; missing slugs are left out"""
+    query, variables, aliases = leetcode_queries.question_batch_query(title_slugs)
+    data = graphql(query, variables)
+    return {slug: data[alias] for alias, slug in aliases.items() if data.get(alias)}
+
+
+def _not_found_key(variables):
+    return leetcode_cache.cache_key('questionNotFound', variables)
+
+
+def _remember_missing(variables, question):
+    """Negative-cache a slug LeetCode has no question for"""
+    if question is None and settings.LEETCODE_NOT_FOUND_TTL:
+        leetcode_cache.get_cache().set(_not_found_key(variables), True, settings.LEETCODE_NOT_FOUND_TTL)
+    return question
+
+
+def _known_missing(title_slug, variables):
+    return not SLUG_RE.fullmatch(title_slug) or leetcode_cache.get_cache().get(_not_found_key(variables), False)
+
+
+def _question_fetcher(variables):
+    return lambda: _store_question(_remember_missing(
+        variables, _question(graphql(QUESTION_CONTENT_QUERY, variables)),
+    ))
+
+
+def get_question(title_slug, before_fetch=None):
+    """Full question payload for the detail page as a Cached (value None if it does not exist).
+
+    Reads the LeetCodeQuestion row first and only waits for the API when
+    there is none. A row older than LEETCODE_QUESTION_TTL is served as stale
+    while a background refresh runs. Malformed slugs and slugs recently
+    reported missing are answered without calling the API. before_fetch(),
+    if given, is called just before waiting for the API and may raise to
+    prevent it (e.g. rate_limit.limit_ip).
+    """
+    variables = {'titleSlug': title_slug}
+    stored = LeetCodeQuestion.objects.filter(title_slug=title_slug).first()
+    if stored and stored.is_fresh(settings.LEETCODE_QUESTION_TTL):
+        return Cached(stored.payload, stored.fetched_at, False)
+    if stored:
+        leetcode_cache.refresh_in_background(
+            'questionContent', variables, _question_fetcher(variables),
+            timeout=settings.LEETCODE_QUESTION_TTL,
+        )
+        return Cached(stored.payload, stored.fetched_at, True)
+    if _known_missing(title_slug, variables):
+        return Cached(None, timezone.now(), False)
+    if before_fetch:
+        before_fetch()
+
+    return leetcode_cache.refresh(
+        'questionContent', variables, _question_fetcher(variables),
+        timeout=settings.LEETCODE_QUESTION_TTL,
+    )
+
+
+async def aget_question(title_slug, before_fetch=None):
+    variables = {'titleSlug': title_slug}
+    stored = await LeetCodeQuestion.objects.filter(title_slug=title_slug).afirst()
+    if stored and stored.is_fresh(settings.LEETCODE_QUESTION_TTL):
+        return Cached(stored.payload, stored.fetched_at, False)
+    if stored:
+        await sync_to_async(leetcode_cache.refresh_in_background)(
+            'questionContent', variables, _question_fetcher(variables),
+            timeout=settings.LEETCODE_QUESTION_TTL,
+        )
+        return Cached(stored.payload, stored.fetched_at, True)
+    if await sync_to_async(_known_missing)(title_slug, variables):
+        return Cached(None, timezone.now(), False)
+    if before_fetch:
+        await sync_to_async(before_fetch)()
+
+    async def fetch():
+        question = _question(await agraphql(QUESTION_CONTENT_QUERY, variables))
+        await sync_to_async(_remember_missing)(variables, question)
+        return await sync_to_async(_store_question)(question)
+
+    return await leetcode_cache.arefresh(
+        'questionContent', variables, fetch,
+        timeout=settings.LEETCODE_QUESTION_TTL,
+    )
+
+
+def cache_stats():
+    return leetcode_cache.stats(QUERY_NAMES)
+
+
+def client_metrics():
+    return metrics.snapshot()
+
+
+def breaker_state():
+    return get_breaker().state()
@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.utils import timezone
+
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'leetcode'
+STATS_PREFIX = 'leetcode:stats'
+
+# Seconds between checks while another process holds the fetch lock
+LOCK_POLL_INTERVAL = 0.05
+
+# A payload plus when it was fetched; `stale` means it is past its TTL and a
+# refresh has been scheduled
+Cached = namedtuple('Cached', 'value fetched_at stale')
+
+_flights = SingleFlight()
+
+
+def get_cache():
+    """Cache backend used for LeetCode payloads (see LEETCODE_CACHE_ALIAS)"""
+    return caches[getattr(settings, 'LEETCODE_CACHE_ALIAS', 'default')]
+
+
+def cache_key(query_name, variables=None):
+    """Build a cache key that is unique per query and per variable set"""
+    payload = json.dumps(variables or {}, sort_keys=True, default=str)
+    digest = hashlib.md5(payload.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:{query_name}:{digest}'
+
+
+def seconds_until_utc_midnight(now=None):
+    """Seconds left until the daily question rolls over (00:00 UTC)"""
+    now = now or datetime.now(dt_timezone.utc)
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(int((midnight - now).total_seconds()), 1)
+
+
+def _incr(name, query_name):
+    cache = get_cache()
+    key = f'{STATS_PREFIX}:{name}:{query_name}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        # incr() raises when the key does not exist yet; add() loses only if
+        # another worker created it in the meantime
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+async def _aincr(name, query_name):
+    cache = get_cache()
+    key = f'{STATS_PREFIX}:{name}:{query_name}'
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        if not await cache.aadd(key, 1, timeout=None):
+            await cache.aincr(key)
+
+
+def _from_entry(entry, timeout):
+    """Cached for a stored entry, or None when there is nothing to serve.
+
+    Freshness is judged against the expiry fixed when the entry was stored:
+    the daily question's timeout shrinks towards midnight on every read.
+    """
+    if entry is None:
+        return None
+    expires_at = entry.get('expires_at') or entry['fetched_at'] + timedelta(seconds=timeout)
+    return Cached(entry['value'], entry['fetched_at'], timezone.now() >= expires_at)
+
+
+def _is_newer(entry, previous):
+    return entry is not None and (previous is None or entry['fetched_at'] > previous['fetched_at'])
+
+
+def _store(cache, key, value, timeout):
+    now = timezone.now()
+    entry = {'value': value, 'fetched_at': now, 'expires_at': now + timedelta(seconds=timeout)}
+    if value is not None:
+        # Keep entries past their TTL so they can be served while refreshing
+        cache.set(key, entry, timeout=timeout + settings.LEETCODE_STALE_TTL)
+    return entry
+
+
+def get_or_fetch(query_name, variables, fetch, timeout):
+    """Return a Cached payload for (query_name, variables).
+
+    Fresh entries are returned as is. Entries past `timeout` are returned
+    right away with stale=True while refresh_in_background() fetches a new
+    copy. Only on a real miss does the caller wait for fetch().
+    """
+    cached = _from_entry(get_cache().get(cache_key(query_name, variables)), timeout)
+    if cached is None:
+        return refresh(query_name, variables, fetch, timeout)
+
+    if cached.stale:
+        _incr('stale', query_name)
+        refresh_in_background(query_name, variables, fetch, timeout)
+    else:
+        _incr('hits', query_name)
+    return cached
+
+
+def refresh(query_name, variables, fetch, timeout):
+    """Call fetch() and cache its result, ignoring what is cached now.
+
+    Concurrent refreshes of the same key are coalesced: within the process
+    through a SingleFlight, across processes through a lock in the cache, so
+    only one caller hits the API and the others share its result.
+
+    Only successful payloads are cached; exceptions raised by fetch() propagate
+    so callers keep their existing error handling.
+    """
+    cache = get_cache()
+    key = cache_key(query_name, variables)
+    entry, shared = _flights.do(key, lambda: _fetch_locked(cache, key, query_name, fetch, timeout))
+    if shared:
+        _incr('coalesced', query_name)
+    return Cached(entry['value'], entry['fetched_at'], False)
+
+
+def _fetch_locked(cache, key, query_name, fetch, timeout):
+    lock_key = f'{key}:lock'
+    lock_timeout = settings.LEETCODE_SINGLEFLIGHT_TIMEOUT
+    if not cache.add(lock_key, 1, timeout=lock_timeout):
+        # Another process is fetching; wait for it to publish the result
+        previous = cache.get(key)
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry = cache.get(key)
+            if _is_newer(entry, previous):
+                _incr('coalesced', query_name)
+                return entry
+            if cache.get(lock_key) is None:
+                break  # the other fetch failed; try ourselves
+        cache.add(lock_key, 1, timeout=lock_timeout)
+
+    try:
+        _incr('misses', query_name)
+        return _store(cache, key, fetch(), timeout)
+    finally:
+        cache.delete(lock_key)
+
+
+def refresh_in_background(query_name, variables, fetch, timeout):
+    """Run refresh() in a daemon thread, at most once at a time per key across workers"""
+    cache = get_cache()
+    refresh_key = f'{cache_key(query_name, variables)}:refresh'
+    if not cache.add(refresh_key, 1, timeout=settings.LEETCODE_SINGLEFLIGHT_TIMEOUT):
+        return
+
+    def run():
+        try:
+            refresh(query_name, variables, fetch, timeout)
+        except Exception as e:
+            logger.warning('Background refresh of %s %s failed: %s', query_name, variables, e)
+        finally:
+            cache.delete(refresh_key)
+            connection.close()
+
+    threading.Thread(target=run, name=f'leetcode-refresh-{query_name}', daemon=True).start()
+
+
+async def aget_or_fetch(query_name, variables, fetch, timeout, sync_fetch):
+    """Async version of get_or_fetch(); fetch is a coroutine function.
+
+    Background refreshes run sync_fetch in a thread so they outlive the
+    request's event loop (which is per request under WSGI).
+    """
+    cached = _from_entry(await get_cache().aget(cache_key(query_name, variables)), timeout)
+    if cached is None:
+        return await arefresh(query_name, variables, fetch, timeout)
+
+    if cached.stale:
+        await _aincr('stale', query_name)
+        await sync_to_async(refresh_in_background)(query_name, variables, sync_fetch, timeout)
+    else:
+        await _aincr('hits', query_name)
+    return cached
+
+
+async def arefresh(query_name, variables, fetch, timeout):
+    """Async version of refresh()"""
+    cache = get_cache()
+    key = cache_key(query_name, variables)
+    entry, shared = await _flights.ado(key, lambda: _afetch_locked(cache, key, query_name, fetch, timeout))
+    if shared:
+        await _aincr('coalesced', query_name)
+    return Cached(entry['value'], entry['fetched_at'], False)
+
+
+async def _afetch_locked(cache, key, query_name, fetch, timeout):
+    lock_key = f'{key}:lock'
+    lock_timeout = settings.LEETCODE_SINGLEFLIGHT_TIMEOUT
+    if not await cache.aadd(lock_key, 1, timeout=lock_timeout):
+        previous = await cache.aget(key)
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            entry = await cache.aget(key)
+            if _is_newer(entry, previous):
+                await _aincr('coalesced', query_name)
+                return entry
+            if await cache.aget(lock_key) is None:
+                break
+        await cache.aadd(lock_key, 1, timeout=lock_timeout)
+
+    try:
+        await _aincr('misses', query_name)
+        value = await fetch()
+        return await sync_to_async(_store)(cache, key, value, timeout)
+    finally:
+        await cache.adelete(lock_key)
+
+
+def invalidate(query_name, variables=None):
+    get_cache().delete(cache_key(query_name, variables))
+
+
+def stats(query_names):
+    """Hit/miss counters per query name"""
+    cache = get_cache()
+    result = {}
+    for query_name in query_names:
+        counters = {
+            name: cache.get(f'{STATS_PREFIX}:{name}:{query_name}', 0)
+            for name in ('hits', 'stale', 'misses', 'coalesced')
+        }
+        total = counters['hits'] + counters['stale'] + counters['misses']
+        counters['hit_rate'] = round((counters['hits'] + counters['stale']) / total, 3) if total else None
+        result[query_name] = counters
+    return result
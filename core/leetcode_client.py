@@ -0,0 +1,252 @@
+"""
+Pooled HTTP clients for the LeetCode GraphQL API.
+
+requests, httpx and certifi take ~100ms to import and are only needed once
+a LeetCode page misses the database, so they are imported when the first
+client is created rather than at worker start-up.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import profiling
+from .metrics import UPSTREAM_ERRORS, UPSTREAM_LATENCY
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    'Content-Type': 'application/json',
+    'Accept-Encoding': 'gzip, deflate',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# 429 is not retried: LeetCode is asking us to slow down, and a retry would
+# spend another request of the budget (see core.rate_limit) on it
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class LatencyMetrics:
+    """Thread-safe per-operation call counts and latency"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation_name, elapsed, ok):
+        with self._lock:
+            stats = self._metrics.setdefault(
+                operation_name, {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            )
+            stats['calls'] += 1
+            stats['errors'] += 0 if ok else 1
+            stats['total_ms'] += elapsed * 1000
+            stats['max_ms'] = max(stats['max_ms'], elapsed * 1000)
+        logger.debug('leetcode %s took %.1fms (ok=%s)', operation_name, elapsed * 1000, ok)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: dict(
+                    stats,
+                    total_ms=round(stats['total_ms'], 1),
+                    max_ms=round(stats['max_ms'], 1),
+                    avg_ms=round(stats['total_ms'] / stats['calls'], 1),
+                )
+                for name, stats in self._metrics.items()
+            }
+
+
+# Shared by the sync and async clients of this process
+metrics = LatencyMetrics()
+
+
+def _observe(operation_name, elapsed, response):
+    """Record one call (response is None when it raised) everywhere it is reported"""
+    ok = response is not None and response.status_code == 200
+    metrics.record(operation_name, elapsed, ok)
+    profiling.record('upstream', elapsed)
+    UPSTREAM_LATENCY.observe(elapsed, operation_name)
+    if not ok:
+        UPSTREAM_ERRORS.inc(operation_name, 'network' if response is None else f'http_{response.status_code}')
+
+
+def _should_retry(response, attempt, max_retries):
+    return response.status_code in RETRY_STATUSES and attempt < max_retries
+
+
+class LeetCodeClient:
+    """Keep-alive HTTP client for the LeetCode GraphQL API.
+
+    Owns one pooled requests.Session so connections (and their TLS sessions)
+    are reused across calls, retries 5xx responses with exponential
+    backoff and records per-operation latency. Each retry takes a token from
+    the `limiter` passed to post(), if any, and is skipped when none is left.
+    """
+
+    def __init__(self, pool_size=10, connect_timeout=3.05, read_timeout=10,
+                 max_retries=2, backoff_factor=0.5, url=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.url = url or settings.LEETCODE_GRAPHQL_URL
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        # What post() raises on network errors, for callers that never import requests
+        self.errors = requests.RequestException
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        # Failed connects only (nothing reached LeetCode); responses are
+        # retried in post(), where each retry is charged to the budget
+        retry = Retry(
+            total=max_retries, connect=max_retries, read=0, status=0, other=0,
+            backoff_factor=backoff_factor,
+            allowed_methods=None,  # GraphQL reads are POSTs
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def post(self, payload, operation_name='graphql', limiter=None):
+        """POST a GraphQL payload and return the requests.Response"""
+        started = time.perf_counter()
+        response = None
+        try:
+            for attempt in range(self.max_retries + 1):
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+                if not _should_retry(response, attempt, self.max_retries) or (limiter and limiter.take()):
+                    break
+                time.sleep(self.backoff_factor * (2 ** attempt))
+            return response
+        finally:
+            _observe(operation_name, time.perf_counter() - started, response)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncLeetCodeClient:
+    """httpx.AsyncClient counterpart of LeetCodeClient for async views.
+
+    An AsyncClient is bound to the event loop it was first used on, so
+    get_async_client() keeps one instance per running loop. Under WSGI, where
+    every request gets a loop of its own, the views use LeetCodeClient instead.
+    """
+
+    def __init__(self, pool_size=100, connect_timeout=3.05, read_timeout=10,
+                 max_retries=2, backoff_factor=0.5, url=None):
+        import httpx
+
+        self.url = url or settings.LEETCODE_GRAPHQL_URL
+        self.errors = httpx.HTTPError
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.client = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            transport=httpx.AsyncHTTPTransport(
+                verify=_ssl_context(),
+                retries=max_retries,  # connect errors only
+            ),
+        )
+
+    async def post(self, payload, operation_name='graphql', limiter=None):
+        """POST a GraphQL payload and return the httpx.Response"""
+        started = time.perf_counter()
+        response = None
+        try:
+            for attempt in range(self.max_retries + 1):
+                response = await self.client.post(self.url, json=payload)
+                if not _should_retry(response, attempt, self.max_retries) or (
+                    limiter and await sync_to_async(limiter.take)()
+                ):
+                    break
+                await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+            return response
+        finally:
+            _observe(operation_name, time.perf_counter() - started, response)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+@functools.lru_cache(maxsize=None)
+def _ssl_context():
+    import ssl
+
+    import certifi
+
+    # Loading the CA bundle takes tens of milliseconds; do it once per process
+    # rather than once per AsyncClient (i.e. per request under WSGI)
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+def _client_options():
+    return {
+        'connect_timeout': settings.LEETCODE_CONNECT_TIMEOUT,
+        'read_timeout': settings.LEETCODE_READ_TIMEOUT,
+        'max_retries': settings.LEETCODE_MAX_RETRIES,
+        'backoff_factor': settings.LEETCODE_RETRY_BACKOFF,
+    }
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide client, recreated after a fork so workers never share sockets"""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = LeetCodeClient(pool_size=settings.LEETCODE_HTTP_POOL_SIZE, **_client_options())
+                _client_pid = pid
+    return _client
+
+
+_async_clients = {}
+
+
+async def _close_with_loop(client):
+    """Suspended for the life of the loop; the loop's shutdown_asyncgens()
+    (run by asyncio.run(), and so by uvicorn and async_to_sync) resumes it
+    into the finally, closing the client while the loop can still run it"""
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+async def get_async_client():
+    """Async client for the running event loop (one per loop, i.e. per ASGI worker).
+
+    The client is closed when its loop shuts down, so short-lived loops
+    (asyncio.run(), async views under WSGI) do not leak their connections.
+    """
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        client = AsyncLeetCodeClient(pool_size=settings.LEETCODE_ASYNC_POOL_SIZE, **_client_options())
+        closer = _close_with_loop(client)
+        with _client_lock:
+            # Forget clients whose loop is gone; the loop closed them on the way out
+            for stale in [l for l in _async_clients if l.is_closed()]:
+                del _async_clients[stale]
+            # Holding the generator keeps it in the loop's weak set of async generators
+            _async_clients[loop] = entry = (client, closer)
+        await closer.asend(None)
+    return entry[0]
@@ -0,0 +1,84 @@
+"""
+GraphQL query builder for the LeetCode API.
+
+Each page asks only for the fields its template renders. Field lists are
+plain Python: a string is a scalar field (optionally `alias: field`), a
+(name, [fields]) tuple is a nested selection.
+"""
+
+# Fields shown on a question card (daily page, recent list)
+QUESTION_CARD_FIELDS = [
+    'acRate',
+    'difficulty',
+    'frontendQuestionId: questionFrontendId',
+    'paidOnly: isPaidOnly',
+    'title',
+    'titleSlug',
+    ('topicTags', ['name']),
+]
+
+# The daily page also renders the problem statement
+DAILY_QUESTION_FIELDS = QUESTION_CARD_FIELDS + ['content']
+
+# Fields rendered by leetcode_question_detail.html (questionId is stored on the model)
+QUESTION_DETAIL_FIELDS = [
+    'questionId',
+    'questionFrontendId',
+    'title',
+    'titleSlug',
+    'content',
+    'difficulty',
+    'likes',
+    'dislikes',
+    'stats',
+    'hints',
+    'sampleTestCase',
+    ('topicTags', ['name']),
+]
+
+
+def selection(fields, indent=1):
+    """Render a field list as a GraphQL selection set"""
+    pad = '    ' * indent
+    lines = []
+    for field in fields:
+        if isinstance(field, tuple):
+            name, subfields = field
+            lines.append(f'{pad}{name} {selection(subfields, indent + 1)}')
+        else:
+            lines.append(f'{pad}{field}')
+    closing = '    ' * (indent - 1)
+    return '{\n' + '\n'.join(lines) + f'\n{closing}}}'
+
+
+def daily_question_query(fields=DAILY_QUESTION_FIELDS):
+    challenge = ['date', 'link', ('question', fields)]
+    return 'query questionOfToday ' + selection([('activeDailyCodingChallengeQuestion', challenge)])
+
+
+def month_challenges_query(fields=QUESTION_CARD_FIELDS):
+    challenges = [('challenges', ['date', 'link', ('question', fields)])]
+    return (
+        'query recentDailyQuestions($year: Int!, $month: Int!) '
+        + selection([('dailyCodingChallengeV2(year: $year, month: $month)', challenges)])
+    )
+
+
+def question_query(fields=QUESTION_DETAIL_FIELDS):
+    return (
+        'query questionContent($titleSlug: String!) '
+        + selection([('question(titleSlug: $titleSlug)', fields)])
+    )
+
+
+def question_batch_query(slugs, fields=QUESTION_DETAIL_FIELDS):
+    """Aliased query fetching several questions in one round trip.
+
+    Returns (query, variables, aliases) where aliases maps each response
+    key (q0, q1, ...) back to its slug.
+    """
+    aliases = {f'q{i}': slug for i, slug in enumerate(slugs)}
+    params = ', '.join(f'$s{i}: String!' for i in range(len(slugs)))
+    roots = [(f'{alias}: question(titleSlug: $s{i})', fields) for i, alias in enumerate(aliases)]
+    variables = {f's{i}': slug for i, slug in enumerate(slugs)}
+    return f'query questionBatch({params}) ' + selection(roots), variables, aliases
@@ -0,0 +1,160 @@
+"""
+Render stage for LeetCode question pages.
+
+Upstream question HTML is sanitized, stats are parsed and the detail body
+is rendered once per question version, then cached under the slug plus a
+hash of the payload. Repeat views only hash the payload and read the cache.
+"""
+
+import hashlib
+import json
+from html import escape
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .leetcode_cache import get_cache
+
+KEY_PREFIX = 'leetcode:html'
+
+# Tags kept from upstream content, with the attributes allowed on each
+ALLOWED_TAGS = {
+    'a': {'href', 'title'},
+    'b': set(), 'blockquote': set(), 'br': set(), 'code': set(), 'div': set(),
+    'em': set(), 'h1': set(), 'h2': set(), 'h3': set(), 'h4': set(), 'h5': set(), 'h6': set(),
+    'i': set(), 'img': {'src', 'alt', 'width', 'height'}, 'li': set(), 'ol': set(),
+    'p': set(), 'pre': set(), 'span': set(), 'strong': set(), 'sub': set(), 'sup': set(),
+    'table': set(), 'tbody': set(), 'td': set(), 'th': set(), 'thead': set(), 'tr': set(),
+    'u': set(), 'ul': set(),
+}
+VOID_TAGS = {'br', 'img'}
+# Tags dropped together with everything inside them
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'noscript', 'template', 'svg', 'math'}
+URL_ATTRS = {'href', 'src'}
+SAFE_SCHEMES = ('http://', 'https://', '/', '#')
+
+
+class _Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.open = []
+        self.skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.skip += 1
+            return
+        if self.skip or tag not in ALLOWED_TAGS:
+            return
+        kept = []
+        for name, value in attrs:
+            if name not in ALLOWED_TAGS[tag] or value is None:
+                continue
+            value = value.strip()
+            if name in URL_ATTRS and not value.lower().startswith(SAFE_SCHEMES):
+                continue
+            kept.append(f' {name}="{escape(value)}"')
+        if tag == 'a':
+            kept.append(' rel="nofollow noopener" target="_blank"')
+        self.out.append(f'<{tag}{"".join(kept)}>')
+        if tag not in VOID_TAGS:
+            self.open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in self.open and tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.skip = max(self.skip - 1, 0)
+            return
+        if self.skip or tag not in self.open:
+            return
+        # Close anything left open inside this tag so the output stays balanced
+        while self.open:
+            current = self.open.pop()
+            self.out.append(f'</{current}>')
+            if current == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.skip:
+            self.out.append(escape(data, quote=False))
+
+    def result(self):
+        self.close()
+        return ''.join(self.out + [f'</{tag}>' for tag in reversed(self.open)])
+
+
+def sanitize_html(html):
+    """Keep an allowlist of tags and attributes and return balanced markup"""
+    if not html:
+        return ''
+    parser = _Sanitizer()
+    parser.feed(html)
+    return parser.result().replace('\xa0', ' ').strip()
+
+
+def parse_stats(stats):
+    """Upstream sends stats as a JSON string; stored payloads hold a dict"""
+    if isinstance(stats, str):
+        try:
+            stats = json.loads(stats)
+        except ValueError:
+            return {}
+    return stats if isinstance(stats, dict) else {}
+
+
+def content_hash(question):
+    payload = json.dumps(question, sort_keys=True, default=str)
+    return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+
+def cache_key(question):
+    return f'{KEY_PREFIX}:{question.get("titleSlug", "")}:{content_hash(question)}'
+
+
+def render_question_body(question):
+    """Render the detail page body for a question payload"""
+    context = {
+        'question': question,
+        'stats': parse_stats(question.get('stats')),
+        'content': mark_safe(sanitize_html(question.get('content'))),
+    }
+    return render_to_string('core/leetcode_question_body.html', context)
+
+
+def question_body(question):
+    """Cached rendered body; re-rendered only when the payload changes"""
+    cache = get_cache()
+    key = cache_key(question)
+    html = cache.get(key)
+    if html is None:
+        html = render_question_body(question)
+        cache.set(key, html, timeout=settings.LEETCODE_RENDER_TTL)
+    return mark_safe(html)
+
+
+async def aquestion_body(question):
+    cache = get_cache()
+    key = cache_key(question)
+    html = await cache.aget(key)
+    if html is None:
+        html = render_question_body(question)
+        await cache.aset(key, html, timeout=settings.LEETCODE_RENDER_TTL)
+    return mark_safe(html)
+
+
+async def aquestion_content(question):
+    """Sanitized description alone, cached like the body (for the daily page's own layout)"""
+    cache = get_cache()
+    key = f'{cache_key(question)}:content'
+    html = await cache.aget(key)
+    if html is None:
+        html = sanitize_html(question.get('content'))
+        await cache.aset(key, html, timeout=settings.LEETCODE_RENDER_TTL)
+    return mark_safe(html)
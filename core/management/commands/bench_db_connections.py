@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+from django.urls import reverse
+
+MODES = ('none', 'persistent', 'pool')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare todo_list latency under each DB_CONN_MODE (none, persistent, pool). "
+        "Every mode runs in a fresh process against DATABASE_URL, through the real "
+        "WSGI/ASGI handlers so connections are opened and closed as in production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help='Requests per run (default: 300)')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients (default: 4)')
+        parser.add_argument('--modes', default=','.join(MODES), help='Comma-separated modes (default: all)')
+        parser.add_argument('--interfaces', default='wsgi,asgi', help='wsgi, asgi or both (default: both)')
+        parser.add_argument('--run', metavar='INTERFACE', help='Internal: measure one run in this process')
+
+    def handle(self, *args, **options):
+        if options['run']:
+            return self.run_one(options)
+        if connection.vendor != 'postgresql':
+            raise CommandError('Set DATABASE_URL to a PostgreSQL database; connection costs are what is measured.')
+
+        self.stdout.write(
+            f"{options['requests']} todo_list requests, {options['concurrency']} concurrent clients"
+        )
+        for interface in options['interfaces'].split(','):
+            for mode in options['modes'].split(','):
+                env = dict(os.environ, DB_CONN_MODE=mode, WEB_CONCURRENCY='1')
+                result = subprocess.run(
+                    [sys.executable, sys.argv[0], 'bench_db_connections', '--run', interface,
+                     '--requests', str(options['requests']), '--concurrency', str(options['concurrency'])],
+                    env=env, capture_output=True, text=True,
+                )
+                if result.returncode:
+                    raise CommandError(f'{mode}/{interface} failed:\n{result.stderr}')
+                self.report(f'{interface.upper()}, {mode}', json.loads(result.stdout.splitlines()[-1]))
+
+    def run_one(self, options):
+        connects = []
+        lock = threading.Lock()
+
+        def count(**kwargs):
+            with lock:
+                connects.append(1)
+
+        connection_created.connect(count)
+        overrides = {
+            'ALLOWED_HOSTS': ['testserver'],
+            'SECURE_SSL_REDIRECT': False,
+            'METRICS_ENABLED': False,
+            # Measure the queries, not the fragment cache
+            'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+            # {% static %} without collectstatic output
+            'STORAGES': dict(settings.STORAGES, staticfiles={
+                'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+            }),
+        }
+        with override_settings(**overrides):
+            if options['run'] == 'wsgi':
+                latencies, elapsed = self.run_wsgi(options)
+            else:
+                latencies, elapsed = asyncio.run(self.run_asgi(options))
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()')
+            backends = cursor.fetchone()[0]
+        self.stdout.write(json.dumps({
+            'latencies': latencies, 'elapsed': elapsed, 'connects': len(connects), 'backends': backends,
+        }))
+
+    def run_wsgi(self, options):
+        from config.wsgi import application
+
+        client = httpx.Client(transport=httpx.WSGITransport(app=application), base_url='http://testserver')
+        url = reverse('todo_list')
+
+        def one(i):
+            started = time.perf_counter()
+            client.get(url).raise_for_status()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            latencies = list(pool.map(one, range(options['requests'])))
+        return latencies, time.perf_counter() - started
+
+    async def run_asgi(self, options):
+        from config.asgi import application
+
+        url = reverse('todo_list')
+        slots = asyncio.Semaphore(options['concurrency'])
+        transport = httpx.ASGITransport(app=application)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+            async def one(i):
+                async with slots:
+                    started = time.perf_counter()
+                    (await client.get(url)).raise_for_status()
+                    return time.perf_counter() - started
+
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*(one(i) for i in range(options['requests'])))
+            return latencies, time.perf_counter() - started
+
+    def report(self, label, result):
+        latencies = sorted(result['latencies'])
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f"{label:>16}: {len(latencies) / result['elapsed']:7.1f} req/s  "
+            f"p50 {statistics.median(latencies) * 1000:6.1f}ms  p95 {p95 * 1000:6.1f}ms  "
+            f"connects {result['connects']:4d}  open after {result['backends']:3d}"
+        )
@@ -0,0 +1,90 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import Todo
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Count the queries (and django_session queries) behind each todo write action, "
+        "POST plus the redirected page, for every SESSION_MODE x MESSAGE_MODE. Runs "
+        "inside a transaction that is rolled back, so the database is left untouched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=20, help='Create/update/delete rounds per mode (default: 20)')
+        parser.add_argument('--with-session', action='store_true',
+                            help='Send a session cookie, as a browser that has visited /admin/ does')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['rounds']} rounds; queries and django_session queries per action (POST + redirect), "
+            f"median time per action"
+        )
+        for message_mode, storage in settings.MESSAGE_STORAGES.items():
+            for session_mode, engine in settings.SESSION_ENGINES.items():
+                overrides = {
+                    'SESSION_ENGINE': engine,
+                    'MESSAGE_STORAGE': storage,
+                    'ALLOWED_HOSTS': ['testserver'],
+                    'SECURE_SSL_REDIRECT': False,
+                    'SESSION_COOKIE_SECURE': False,
+                    'METRICS_ENABLED': False,
+                    # {% static %} without collectstatic output
+                    'STORAGES': dict(settings.STORAGES, staticfiles={
+                        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+                    }),
+                }
+                with override_settings(**overrides):
+                    results = self.run_mode(options)
+                self.report(f'{message_mode} messages, {session_mode} sessions', results)
+
+    def run_mode(self, options):
+        results = {'create': [], 'update': [], 'delete': []}
+        try:
+            with transaction.atomic():
+                client = Client()
+                if options['with_session']:
+                    session = client.session
+                    session['visited'] = True
+                    session.save()
+                    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+                for i in range(options['rounds']):
+                    fields = {'title': f'Benchmark {i}', 'priority': 'medium', 'status': 'pending'}
+                    results['create'].append(self.action(client, reverse('todo_create'), fields))
+                    pk = Todo.objects.latest('id').pk
+                    results['update'].append(self.action(client, reverse('todo_update', args=[pk]), fields))
+                    results['delete'].append(self.action(client, reverse('todo_delete', args=[pk]), {}))
+                raise Rollback
+        except Rollback:
+            pass
+        return results
+
+    def action(self, client, url, data):
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(url, data)
+            client.get(response['Location'])
+        elapsed = time.perf_counter() - started
+        session_queries = sum(1 for query in queries if 'django_session' in query['sql'])
+        return len(queries), session_queries, elapsed
+
+    def report(self, label, results):
+        parts = []
+        for action, samples in results.items():
+            total = statistics.mean(sample[0] for sample in samples)
+            session = statistics.mean(sample[1] for sample in samples)
+            elapsed = statistics.median(sample[2] for sample in samples)
+            parts.append(f'{action} {total:4.1f} ({session:.1f}) {elapsed * 1000:5.1f}ms')
+        self.stdout.write(f'{label:>42}: ' + '  '.join(parts))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core import todo_io
+from core.models import Todo
+
+
+class Command(BaseCommand):
+    help = 'Export all todos as CSV or NDJSON, streaming rows so memory stays flat.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(todo_io.CONTENT_TYPES), default='csv')
+        parser.add_argument('--output', '-o', help='File to write (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows per database fetch (default: 2000)')
+
+    def handle(self, *args, **options):
+        lines = todo_io.export_lines(Todo.objects.all(), options['format'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as f:
+                f.writelines(lines)
+        else:
+            for piece in lines:
+                self.stdout.write(piece, ending='')
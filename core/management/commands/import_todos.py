@@ -0,0 +1,40 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import todo_io
+
+
+class Command(BaseCommand):
+    help = (
+        'Import todos from a CSV or NDJSON file written by export_todos, '
+        'inserting them with bulk_create in batches inside one transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(todo_io.CONTENT_TYPES), help='Default: from the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT (default: 1000)')
+        parser.add_argument(
+            '--upsert', action='store_true',
+            help='Keep ids from the file and update todos that already exist (default: insert as new todos)',
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        fmt = options['format'] or path.suffix.lstrip('.').lower()
+        if fmt not in todo_io.CONTENT_TYPES:
+            raise CommandError('Cannot tell the format from the file name; pass --format')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        start = time.monotonic()
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                written = todo_io.import_rows(
+                    todo_io.read_rows(f, fmt), batch_size=options['batch_size'], upsert=options['upsert'],
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Import failed, nothing was written: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Imported {written} todos in {time.monotonic() - start:.1f}s'))
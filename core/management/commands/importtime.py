@@ -0,0 +1,117 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: what a gunicorn worker does before and while
+# serving its first request
+BOOT = '''
+import io, json, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+booted = time.perf_counter()
+environ = {{
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': {path!r}, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+    'SERVER_NAME': 'localhost', 'SERVER_PORT': '443', 'HTTP_HOST': 'localhost',
+    'wsgi.url_scheme': 'https', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+    'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+}}
+statuses = []
+body = b''.join(application(environ, lambda status, headers: statuses.append(status)))
+served = time.perf_counter()
+rss = next(line for line in open('/proc/self/status') if line.startswith('VmRSS:')).split()[1]
+print(json.dumps({{
+    'boot_ms': (booted - started) * 1000,
+    'first_request_ms': (served - booted) * 1000,
+    'rss_mb': int(rss) / 1024,
+    'status': int(statuses[0].split()[0]),
+}}))
+'''
+
+PROJECT_PACKAGES = ('core', 'config')
+
+Import = namedtuple('Import', 'name depth self_us cumulative_us parent')
+
+
+def parse_importtime(stderr):
+    """Imports from `python -X importtime` output, each with the module that imported it"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append([name.strip(), depth, int(self_us), int(cumulative_us), None])
+    # A module is listed after everything it imported; its parent is the next
+    # entry one level up
+    open_parents = {}
+    for row in reversed(rows):
+        row[4] = open_parents.get(row[1] - 1)
+        open_parents[row[1]] = row[0]
+    return [Import(*row) for row in rows]
+
+
+def is_project(name):
+    return name.split('.')[0] in PROJECT_PACKAGES
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile worker start-up with `python -X importtime`: time to build the WSGI "
+        "application and serve a first request, resident memory, and which imports "
+        "(especially those pulled in by this project's modules) cost the most."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/health/', help='First request to serve (default: /health/)')
+        parser.add_argument('--top', type=int, default=15, help='Rows per table (default: 15)')
+        parser.add_argument('--settings-module', default=os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings'),
+                            help='Settings module to boot with (default: DJANGO_SETTINGS_MODULE)')
+        parser.add_argument('--runs', type=int, default=5, help='Boots to take timings from (default: 5)')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=options['settings_module'], PYTHONPATH=str(settings.BASE_DIR))
+
+        def boot(*flags):
+            command = [sys.executable, *flags, '-c', BOOT.format(path=options['path'])]
+            result = subprocess.run(command, env=env, capture_output=True, text=True, cwd=settings.BASE_DIR)
+            if result.returncode:
+                raise CommandError(result.stderr[-3000:])
+            return json.loads(result.stdout.splitlines()[-1]), result.stderr
+
+        # Timings come from plain runs; -X importtime slows imports down
+        results = [boot()[0] for run in range(options['runs'])]
+        imports = parse_importtime(boot('-X', 'importtime')[1])
+
+        def median(key):
+            return statistics.median(r[key] for r in results)
+
+        self.stdout.write(
+            f"{options['settings_module']}: boot {median('boot_ms'):.0f}ms, first request to {options['path']} "
+            f"{median('first_request_ms'):.0f}ms (status {results[-1]['status']}), RSS {median('rss_mb'):.1f}MB, "
+            f"{len(imports)} modules, {sum(i.self_us for i in imports) / 1000:.0f}ms importing "
+            f"(median of {len(results)} runs; import times below are inflated by -X importtime)"
+        )
+
+        by_package = Counter()
+        for i in imports:
+            by_package[i.name.split('.')[0]] += i.self_us
+        self.stdout.write('\nImport time by top-level package:')
+        for package, self_us in by_package.most_common(options['top']):
+            self.stdout.write(f'  {self_us / 1000:8.1f}ms  {package}')
+
+        # Third-party/stdlib modules imported directly by project code: the
+        # candidates for deferring to first use
+        edges = sorted(
+            (i for i in imports if i.parent and is_project(i.parent) and not is_project(i.name)),
+            key=lambda i: i.cumulative_us, reverse=True,
+        )
+        self.stdout.write('\nHeaviest imports made by project modules:')
+        for i in edges[:options['top']]:
+            self.stdout.write(f'  {i.cumulative_us / 1000:8.1f}ms  {i.parent} -> {i.name}')
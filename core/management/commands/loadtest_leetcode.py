@@ -0,0 +1,151 @@
+import asyncio
+import json
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import reverse
+
+from core.models import LeetCodeQuestion
+
+QUESTION = {
+    'questionId': '1',
+    'questionFrontendId': '1',
+    'title': 'Two Sum',
+    'titleSlug': 'two-sum',
+    'difficulty': 'Easy',
+    'likes': 100,
+    'dislikes': 5,
+    'stats': '{"acRate": 50.0, "totalAccepted": "10", "totalSubmission": "20"}',
+    'topicTags': [{'name': 'Array'}],
+    'content': '<p>Given an array of integers...</p>',
+}
+
+
+SLUG_PREFIX = 'loadtest-'
+
+
+class StubGraphQLServer(ThreadingHTTPServer):
+    """Local stand-in for leetcode.com that answers every POST after a fixed delay"""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, latency):
+        self.latency = latency
+        super().__init__(('127.0.0.1', 0), StubGraphQLHandler)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/graphql/'
+
+
+class StubGraphQLHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        slug = (request.get('variables') or {}).get('titleSlug', 'two-sum')
+        time.sleep(self.server.latency)
+        body = json.dumps({'data': {'question': dict(QUESTION, titleSlug=slug)}}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def question_url(name):
+    return reverse('leetcode_question_detail', args=[f'{SLUG_PREFIX}{name}'])
+
+
+def check(response):
+    response.raise_for_status()
+    if 'Two Sum' not in response.text:
+        error = re.search(r'<div class="error">.*?<p>(.*?)</p>', response.text, re.S)
+        raise CommandError(f'{response.url.path} did not render the stub question: {error and error.group(1)}')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare how many concurrent upstream-bound question pages one process serves "
+        "under WSGI (thread per request) and under ASGI (async views), against a local "
+        "stub GraphQL server. Every request asks for a new slug so it goes upstream."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Total requests per mode (default: 200)')
+        parser.add_argument('--latency', type=float, default=0.2, help='Stub upstream latency in seconds (default: 0.2)')
+        parser.add_argument('--threads', type=int, default=4, help='WSGI worker threads (default: 4)')
+
+    def handle(self, *args, **options):
+        server = StubGraphQLServer(options['latency'])
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        overrides = {
+            'LEETCODE_GRAPHQL_URL': server.url,
+            'LEETCODE_MAX_RETRIES': 0,
+            # Measure the app, not the request budgets
+            'LEETCODE_RATE_LIMIT': 0,
+            'LEETCODE_DETAIL_IP_RATE': 0,
+            'ALLOWED_HOSTS': ['testserver'],
+            'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+        }
+        try:
+            with override_settings(**overrides):
+                self.stdout.write(
+                    f"{options['requests']} requests, upstream latency {options['latency'] * 1000:.0f}ms"
+                )
+                self.report(f"WSGI, {options['threads']} threads", self.run_wsgi(options))
+                self.report('ASGI, async views', asyncio.run(self.run_asgi(options)))
+        finally:
+            server.shutdown()
+            LeetCodeQuestion.objects.filter(title_slug__startswith=SLUG_PREFIX).delete()
+
+    def run_wsgi(self, options):
+        from config.wsgi import application
+
+        client = httpx.Client(transport=httpx.WSGITransport(app=application), base_url='https://testserver')
+
+        def one(i):
+            started = time.perf_counter()
+            check(client.get(question_url(f'wsgi-{i}')))
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            latencies = list(pool.map(one, range(options['requests'])))
+        return latencies, time.perf_counter() - started
+
+    async def run_asgi(self, options):
+        from config.asgi import application
+
+        transport = httpx.ASGITransport(app=application)
+        async with httpx.AsyncClient(transport=transport, base_url='https://testserver') as client:
+            async def one(i):
+                started = time.perf_counter()
+                check(await client.get(question_url(f'asgi-{i}')))
+                return time.perf_counter() - started
+
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*(one(i) for i in range(options['requests'])))
+            return latencies, time.perf_counter() - started
+
+    def report(self, label, result):
+        latencies, elapsed = result
+        latencies = sorted(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f'{label:>24}: {len(latencies) / elapsed:8.1f} req/s  '
+            f'wall {elapsed:6.2f}s  p50 {statistics.median(latencies) * 1000:7.1f}ms  '
+            f'p95 {p95 * 1000:7.1f}ms'
+        )
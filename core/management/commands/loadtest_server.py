@@ -0,0 +1,147 @@
+import asyncio
+import os
+import runpy
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from unittest import mock
+
+import httpx
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from core.models import LeetCodeQuestion
+
+from .loadtest_leetcode import SLUG_PREFIX, StubGraphQLServer, question_url
+
+CONFIG = settings.BASE_DIR / 'gunicorn.conf.py'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def worker_rss_mb(master_pid):
+    """Resident memory of each worker of a gunicorn master, in MB"""
+    children = open(f'/proc/{master_pid}/task/{master_pid}/children').read().split()
+    sizes = []
+    for pid in children:
+        for line in open(f'/proc/{pid}/status'):
+            if line.startswith('VmRSS:'):
+                sizes.append(int(line.split()[1]) / 1024)
+    return sizes
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the app under gunicorn.conf.py for each server profile and load it with "
+        "concurrent requests: DB-bound todo pages, then upstream-bound question pages "
+        "(against a local stub of the LeetCode API). Reports throughput, latency and "
+        "worker memory, to check the autotuned numbers on this machine."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default='asgi,sync', help='Server profiles to test (default: asgi,sync)')
+        parser.add_argument('--workers', default='', help='Comma-separated worker counts to compare (default: autotuned)')
+        parser.add_argument('--requests', type=int, default=300, help='Requests per page kind (default: 300)')
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent clients (default: 32)')
+        parser.add_argument('--latency', type=float, default=0.2, help='Stub upstream latency in seconds (default: 0.2)')
+
+    def handle(self, *args, **options):
+        # The production static storage needs the collectstatic manifest
+        call_command('collectstatic', interactive=False, verbosity=0)
+        upstream = StubGraphQLServer(options['latency'])
+        threading.Thread(target=upstream.serve_forever, daemon=True).start()
+        worker_counts = [int(n) for n in options['workers'].split(',') if n] or [None]
+
+        self.stdout.write(
+            f"{options['requests']} requests per page kind, {options['concurrency']} concurrent clients, "
+            f"upstream latency {options['latency'] * 1000:.0f}ms"
+        )
+        try:
+            for profile in options['profiles'].split(','):
+                for workers in worker_counts:
+                    self.run_profile(profile, workers, upstream, options)
+        finally:
+            upstream.shutdown()
+            LeetCodeQuestion.objects.filter(title_slug__startswith=SLUG_PREFIX).delete()
+
+    def run_profile(self, profile, workers, upstream, options):
+        env = dict(
+            os.environ, SERVER_PROFILE=profile, LEETCODE_GRAPHQL_URL=upstream.url, LEETCODE_MAX_RETRIES='0',
+            # Every request comes from 127.0.0.1 for new slugs; measure the server, not the budgets
+            LEETCODE_RATE_LIMIT='0', LEETCODE_DETAIL_IP_RATE='0',
+        )
+        env.pop('WEB_CONCURRENCY', None)
+        if workers:
+            env['WEB_CONCURRENCY'] = str(workers)
+        with mock.patch.dict(os.environ, env, clear=True):
+            tuned = runpy.run_path(str(CONFIG))  # what the config derives with this environment
+        port = env['PORT'] = str(free_port())
+
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', str(CONFIG)],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        try:
+            base_url = f'http://127.0.0.1:{port}'
+            self.wait_until_up(server, base_url)
+            workers = workers or tuned['workers']
+            self.stdout.write(
+                f"\n{profile}: {workers} workers x {tuned['threads']} threads, keepalive {tuned['keepalive']}s, "
+                f"max_requests {tuned['max_requests']}+{tuned['max_requests_jitter']}"
+            )
+            todo = asyncio.run(self.load(base_url, lambda i: reverse('todo_list'), options))
+            self.report('todo_list', todo)
+            question = asyncio.run(self.load(base_url, lambda i: question_url(f'{profile}-{workers}-{i}'), options))
+            self.report('question detail', question)
+            rss = worker_rss_mb(server.pid)
+            self.stdout.write(f"{'worker RSS':>16}: {', '.join(f'{size:.0f}' for size in rss)} MB")
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    def wait_until_up(self, server, base_url):
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn exited:\n{server.stderr.read()}')
+            try:
+                httpx.get(f'{base_url}/health/', headers={'X-Forwarded-Proto': 'https'}).raise_for_status()
+                return
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        raise CommandError('gunicorn did not start within 30s')
+
+    async def load(self, base_url, path, options):
+        slots = asyncio.Semaphore(options['concurrency'])
+        limits = httpx.Limits(max_connections=options['concurrency'])
+        # Proxy header from 127.0.0.1 marks the request secure, as behind the load balancer
+        headers = {'X-Forwarded-Proto': 'https'}
+        async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+            async def one(i):
+                async with slots:
+                    started = time.perf_counter()
+                    response = await client.get(path(i))
+                    return time.perf_counter() - started, response.status_code == 200
+
+            started = time.perf_counter()
+            results = await asyncio.gather(*(one(i) for i in range(options['requests'])))
+            return results, time.perf_counter() - started
+
+    def report(self, label, result):
+        results, elapsed = result
+        latencies = sorted(latency for latency, ok in results)
+        errors = sum(1 for latency, ok in results if not ok)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f'{label:>16}: {len(latencies) / elapsed:7.1f} req/s  '
+            f'p50 {statistics.median(latencies) * 1000:7.1f}ms  p95 {p95 * 1000:7.1f}ms  errors {errors}'
+        )
@@ -0,0 +1,140 @@
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from core import leetcode
+from core.models import LeetCodeQuestion
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-fetch today's LeetCode question, the current month of daily challenges "
+        "and every referenced question detail into the cache and the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Year of the month to prefetch (default: current)')
+        parser.add_argument('--month', type=int, help='Month to prefetch (default: current)')
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent detail fetches (default: 4)')
+        parser.add_argument(
+            '--batch-size', type=int, default=10,
+            help='Questions fetched per aliased GraphQL request (default: 10)',
+        )
+        parser.add_argument('--force', action='store_true', help='Refetch questions even if they are still fresh')
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and repeat every N seconds (default: run once)',
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--workers and --batch-size must be at least 1')
+
+        while True:
+            ok = self.run_once(options)
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+            # Passes run outside any request; drop connections the server
+            # closed or that outlived CONN_MAX_AGE before the next one
+            close_old_connections()
+        if not ok:
+            raise CommandError('prefetch incomplete, see the errors above')
+
+    def run_once(self, options):
+        now = timezone.now()
+        year = options['year'] or now.year
+        month = options['month'] or now.month
+        slugs = set()
+        failed = []
+
+        with self.phase('daily', failed):
+            try:
+                result = leetcode.get_daily_challenge()
+            except leetcode.LeetCodeError as e:
+                self.stderr.write(f'  daily question failed: {e}')
+                failed.append('daily')
+            else:
+                if result.stale:
+                    self.stderr.write('  daily question failed: LeetCode unreachable, only a stored challenge is available')
+                    failed.append('daily')
+                if result.value:
+                    slugs.add(result.value['question']['titleSlug'])
+
+        with self.phase(f'month {year}-{month:02d}', failed):
+            try:
+                if options['force']:
+                    result = leetcode.refresh_month_challenges(year, month)
+                else:
+                    result = leetcode.get_month_challenges(year, month, wait=True)
+            except leetcode.LeetCodeError as e:
+                self.stderr.write(f'  month failed: {e}')
+                failed.append('month')
+            else:
+                if result.stale:
+                    self.stderr.write('  month failed: LeetCode unreachable, kept the stored challenges')
+                    failed.append('month')
+                challenges = result.value or []
+                slugs.update(c['question']['titleSlug'] for c in challenges if c.get('question'))
+
+        with self.phase('details', failed):
+            todo = self.stale_slugs(slugs, options['force'])
+            self.stdout.write(f'  {len(slugs) - len(todo)} fresh, {len(todo)} to fetch')
+            if self.fetch_details(todo, options['workers'], options['batch_size']):
+                failed.append('details')
+        return not failed
+
+    def stale_slugs(self, slugs, force):
+        if force:
+            return sorted(slugs)
+        cutoff = timezone.now() - timedelta(seconds=settings.LEETCODE_QUESTION_TTL)
+        fresh = set(
+            LeetCodeQuestion.objects
+            .filter(title_slug__in=slugs, fetched_at__gte=cutoff)
+            .values_list('title_slug', flat=True)
+        )
+        return sorted(slugs - fresh)
+
+    def fetch_details(self, slugs, workers, batch_size):
+        # Only the HTTP round trips run in the pool; rows are written from this
+        # thread so SQLite never sees concurrent writers.
+        batches = [slugs[i:i + batch_size] for i in range(0, len(slugs), batch_size)]
+        failures = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(leetcode.fetch_questions, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    questions = future.result()
+                except leetcode.LeetCodeError as e:
+                    failures += len(batch)
+                    self.stderr.write(f'  {", ".join(batch)} failed: {e}')
+                    continue
+                for question in questions.values():
+                    LeetCodeQuestion.store(question)
+                missing = set(batch) - set(questions)
+                if missing:
+                    failures += len(missing)
+                    self.stderr.write(f'  not found: {", ".join(sorted(missing))}')
+        if failures:
+            self.stderr.write(f'  {failures} of {len(slugs)} questions failed')
+        return failures
+
+    @contextmanager
+    def phase(self, name, failed):
+        """Report how long a prefetch phase took, and whether it added to `failed`"""
+        self.stdout.write(f'{name}...')
+        started = time.monotonic()
+        failures = len(failed)
+        yield
+        elapsed = time.monotonic() - started
+        if len(failed) > failures:
+            self.stdout.write(self.style.ERROR(f'  {name} failed after {elapsed:.2f}s'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'  {name} done in {elapsed:.2f}s'))
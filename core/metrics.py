@@ -0,0 +1,341 @@
+"""
+Process-wide counters and histograms exposed at /metrics/ in the
+Prometheus text format.
+
+Values are kept in memory per process. With METRICS_DIR set, every process
+writes its values to METRICS_DIR/<pid>.json (at most every
+METRICS_FLUSH_INTERVAL seconds, after a request) and a scrape sums the
+files of all gunicorn workers, so any worker can answer for the whole
+instance. So that counters never go backwards, each process first folds
+the files of exited workers (and of an earlier process with its pid) into
+METRICS_DIR/exited.json; the directory holds one file per live worker
+plus that one.
+
+Cache hit/miss counters are already shared through the cache backend
+(leetcode_cache.stats(), fragments.stats()) and are read at scrape time.
+"""
+
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Totals of exited processes, in METRICS_DIR
+EXITED_FILE = 'exited.json'
+
+# Prometheus' default latency buckets (seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labelvalues):
+        if len(labelvalues) != len(self.labels):
+            raise ValueError(f'{self.name} expects labels {self.labels}, got {labelvalues}')
+        return tuple(str(value) for value in labelvalues)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labelvalues, amount=1):
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    @staticmethod
+    def merge(value, other):
+        return value + other
+
+    def lines(self, values):
+        for key, value in values.items():
+            yield f'{self.name}{_labels(self.labels, key)} {_number(value)}'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labelvalues):
+        key = self._key(labelvalues)
+        with self._lock:
+            # [per-bucket counts (not cumulative), +Inf count, sum]
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += 1
+            entry[2] += value
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), [list(counts), count, total]] for key, (counts, count, total) in self._values.items()]
+
+    @staticmethod
+    def merge(value, other):
+        return [[a + b for a, b in zip(value[0], other[0])], value[1] + other[1], value[2] + other[2]]
+
+    def lines(self, values):
+        for key, (counts, count, total) in values.items():
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                yield f'{self.name}_bucket{_labels(self.labels + ("le",), key + (_number(bound),))} {cumulative}'
+            yield f'{self.name}_bucket{_labels(self.labels + ("le",), key + ("+Inf",))} {count}'
+            yield f'{self.name}_sum{_labels(self.labels, key)} {_number(total)}'
+            yield f'{self.name}_count{_labels(self.labels, key)} {count}'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _number(value):
+    return repr(float(value))
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read_snapshot(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}  # missing, or being replaced; picked up next scrape
+
+
+def _write_snapshot(path, snapshot):
+    tmp = path.with_name(f'.{path.name}.tmp')
+    tmp.write_text(json.dumps(snapshot))
+    os.replace(tmp, path)
+
+
+class _DirectoryLock:
+    """flock on METRICS_DIR/.lock: exclusive while folding files, shared while reading them"""
+
+    def __init__(self, directory, operation):
+        self.path = Path(directory) / '.lock'
+        self.operation = operation
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        fcntl.flock(self.file, self.operation)
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._last_flush = 0.0
+        self._flush_lock = threading.Lock()
+        self._started = set()  # directories this process has written to
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def clear(self):
+        for metric in self.metrics.values():
+            metric.clear()
+
+    def flush(self, directory=None):
+        """Write this process' values to <directory>/<pid>.json"""
+        directory = directory or settings.METRICS_DIR
+        if not directory:
+            return
+        with self._flush_lock:
+            path = Path(directory)
+            if path not in self._started:
+                path.mkdir(parents=True, exist_ok=True)
+                self.fold_exited(path)
+                self._started.add(path)
+            _write_snapshot(path / f'{os.getpid()}.json', self.snapshot())
+            self._last_flush = time.monotonic()
+
+    def fold_exited(self, directory):
+        """Add the files of processes that are gone to exited.json and remove them.
+
+        Run before a process first writes its own file, so a reused pid
+        never overwrites a dead worker's totals.
+        """
+        path = Path(directory)
+        with _DirectoryLock(path, fcntl.LOCK_EX):
+            exited = [
+                file for file in path.glob('*.json')
+                if file.stem.isdigit() and (int(file.stem) == os.getpid() or not _alive(int(file.stem)))
+            ]
+            if not exited:
+                return
+            snapshots = [_read_snapshot(path / EXITED_FILE)] + [_read_snapshot(file) for file in exited]
+            merged = self.merge(snapshots)
+            _write_snapshot(path / EXITED_FILE, {
+                name: [[list(key), value] for key, value in values.items()] for name, values in merged.items()
+            })
+            for file in exited:
+                file.unlink()
+
+    def maybe_flush(self):
+        if settings.METRICS_DIR and time.monotonic() - self._last_flush >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def collect(self):
+        """{metric name: {label values: value}}, summed over all worker files"""
+        if settings.METRICS_DIR:
+            self.flush()
+            with _DirectoryLock(settings.METRICS_DIR, fcntl.LOCK_SH):
+                snapshots = [_read_snapshot(path) for path in Path(settings.METRICS_DIR).glob('*.json')]
+        else:
+            snapshots = [self.snapshot()]
+        return self.merge(snapshots)
+
+    def merge(self, snapshots):
+        """Sum snapshots into {metric name: {label values: value}}"""
+        merged = {name: {} for name in self.metrics}
+        for snapshot in snapshots:
+            for name, samples in snapshot.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                values = merged[name]
+                for key, value in samples:
+                    key = tuple(key)
+                    values[key] = metric.merge(values[key], value) if key in values else value
+        return merged
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = Histogram(
+    'django_request_duration_seconds', 'Request latency by URL name', ('view', 'method'),
+)
+REQUESTS = Counter(
+    'django_requests_total', 'Responses by URL name and status code', ('view', 'status'),
+)
+DB_QUERIES = Counter(
+    'django_db_queries_total', 'SQL queries executed, by URL name', ('view',),
+)
+UPSTREAM_LATENCY = Histogram(
+    'leetcode_graphql_duration_seconds', 'LeetCode GraphQL call latency by query name', ('operation',),
+)
+UPSTREAM_ERRORS = Counter(
+    'leetcode_graphql_errors_total', 'Failed LeetCode GraphQL calls by query name and reason', ('operation', 'reason'),
+)
+RATE_LIMITED = Counter(
+    'rate_limited_total', 'Calls refused by a rate limiter, by limiter name', ('limiter',),
+)
+
+# Queries run outside a request (background refreshes, commands)
+NO_VIEW = 'none'
+
+_db_queries = ContextVar('metrics_db_queries', default=None)
+
+
+def start_request():
+    """Count SQL against the current request; returns a token for end_request()"""
+    return _db_queries.set([0])
+
+
+def end_request(token, view, method, status, elapsed):
+    queries = _db_queries.get()[0]
+    _db_queries.reset(token)
+    REQUEST_LATENCY.observe(elapsed, view, method)
+    REQUESTS.inc(view, status)
+    if queries:
+        DB_QUERIES.inc(view, amount=queries)
+    REGISTRY.maybe_flush()
+
+
+def _count_queries(execute, sql, params, many, context):
+    counter = _db_queries.get()
+    if counter is not None:
+        counter[0] += 1
+    else:
+        DB_QUERIES.inc(NO_VIEW)
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(connection, **kwargs):
+    """connection_created receiver; also called for connections already open"""
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+def _cache_lines():
+    # Imported here: leetcode imports leetcode_client, which imports this module
+    from . import fragments, leetcode
+
+    yield '# HELP leetcode_cache_events_total LeetCode payload cache lookups by query and outcome'
+    yield '# TYPE leetcode_cache_events_total counter'
+    for query, counters in leetcode.cache_stats().items():
+        for event in ('hits', 'stale', 'misses', 'coalesced'):
+            yield f'leetcode_cache_events_total{_labels(("query", "event"), (query, event))} {_number(counters[event])}'
+
+    yield '# HELP fragment_cache_events_total Rendered fragment cache lookups by fragment and outcome'
+    yield '# TYPE fragment_cache_events_total counter'
+    for name, counters in fragments.stats().items():
+        for event in ('hits', 'misses'):
+            yield f'fragment_cache_events_total{_labels(("fragment", "event"), (name, event))} {_number(counters[event])}'
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for name, values in REGISTRY.collect().items():
+        metric = REGISTRY.metrics[name]
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        lines.extend(metric.lines(dict(sorted(values.items()))))
+    lines.extend(_cache_lines())
+    return '\n'.join(lines) + '\n'
+
+
+atexit.register(REGISTRY.flush)
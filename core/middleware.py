@@ -0,0 +1,180 @@
+import cProfile
+import json
+import logging
+import re
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics, profiling
+
+profile_logger = logging.getLogger('core.profiling')
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise that can run in an async middleware chain.
+
+    The stock middleware is sync-only, which makes Django run every request
+    below it (including the async LeetCode views) through a single sync
+    thread under ASGI. Static files are still served by WhiteNoise; anything
+    else is passed straight to the async handler.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class ProfilingMiddleware:
+    """Time each request and break it down into SQL, LeetCode calls, JSON
+    decoding and template rendering (see core.profiling).
+
+    Adds a Server-Timing header and logs one JSON line per request. With
+    PROFILING_DUMP_THRESHOLD_MS set, requests run under cProfile and the
+    slow ones are dumped to PROFILING_DUMP_DIR. Disabled unless
+    PROFILING_ENABLED is set.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    # cProfile can only follow one request at a time per process
+    _profiler_lock = threading.Lock()
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = settings.PROFILING_DUMP_THRESHOLD_MS
+        self.dump_dir = Path(settings.PROFILING_DUMP_DIR)
+        connection_created.connect(profiling.install_sql_timer)
+        for connection in connections.all(initialized_only=True):
+            profiling.install_sql_timer(connection)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile, token, profiler = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiling.stop(token)
+            self._stop_profiler(profiler)
+        return self._finish(request, response, profile, profiler)
+
+    async def __acall__(self, request):
+        profile, token, profiler = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiling.stop(token)
+            self._stop_profiler(profiler)
+        return self._finish(request, response, profile, profiler)
+
+    def _start(self):
+        profiler = None
+        if self.threshold and self._profiler_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            profiler.enable()
+        profile, token = profiling.start()
+        return profile, token, profiler
+
+    def _stop_profiler(self, profiler):
+        if profiler is not None:
+            profiler.disable()
+            self._profiler_lock.release()
+
+    def _finish(self, request, response, profile, profiler):
+        total = profile.elapsed()
+        response.headers['Server-Timing'] = profile.server_timing(total)
+        data = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            'status': response.status_code,
+            **profile.as_dict(total),
+        }
+        if profiler is not None and total * 1000 >= self.threshold:
+            data['profile'] = str(self._dump(profiler, request, total))
+        profile_logger.info(json.dumps(data))
+        return response
+
+    def _dump(self, profiler, request, total):
+        self.dump_dir.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-') or 'root'
+        path = self.dump_dir / f'{time.strftime("%Y%m%d-%H%M%S")}-{request.method}-{slug}-{total * 1000:.0f}ms.prof'
+        profiler.dump_stats(path)
+        return path
+
+
+class MetricsMiddleware:
+    """Record latency, status and SQL query count per URL name for /metrics/
+    (see core.metrics). Disabled when METRICS_ENABLED is off."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        connection_created.connect(metrics.install_query_counter)
+        for connection in connections.all(initialized_only=True):
+            metrics.install_query_counter(connection)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        token = metrics.start_request()
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            self._record(request, response, token, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        token = metrics.start_request()
+        response = None
+        try:
+            response = await self.get_response(request)
+            return response
+        finally:
+            self._record(request, response, token, started)
+
+    def _record(self, request, response, token, started):
+        # Unrouted paths share one label so scanners cannot blow up cardinality
+        view = getattr(request.resolver_match, 'view_name', None) or 'unmatched'
+        status = response.status_code if response is not None else 500
+        metrics.end_request(token, view, request.method, status, time.perf_counter() - started)
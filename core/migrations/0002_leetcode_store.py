@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-18 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyChallenge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('link', models.CharField(blank=True, max_length=255)),
+                ('title_slug', models.SlugField(max_length=200)),
+                ('question', models.JSONField(default=dict)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LeetCodeQuestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title_slug', models.SlugField(max_length=200, unique=True)),
+                ('question_id', models.CharField(blank=True, max_length=20)),
+                ('frontend_id', models.CharField(blank=True, max_length=20)),
+                ('title', models.CharField(max_length=200)),
+                ('difficulty', models.CharField(blank=True, max_length=10)),
+                ('content', models.TextField(blank=True)),
+                ('stats', models.JSONField(blank=True, default=dict)),
+                ('hints', models.JSONField(blank=True, default=list)),
+                ('topic_tags', models.JSONField(blank=True, default=list)),
+                ('payload', models.JSONField(default=dict)),
+                ('fetched_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'ordering': ['title_slug'],
+            },
+        ),
+    ]
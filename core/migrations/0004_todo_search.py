@@ -0,0 +1,79 @@
+from django.db import migrations
+
+# PostgreSQL: a stored generated tsvector column with a GIN index. Titles
+# weigh more than descriptions when ranking.
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE core_todo ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX todo_search_idx ON core_todo USING GIN (search_vector)',
+]
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS todo_search_idx',
+    'ALTER TABLE core_todo DROP COLUMN IF EXISTS search_vector',
+]
+
+# SQLite: an external-content FTS5 table over core_todo kept in sync by
+# triggers, so bulk_create(), update() and delete() are covered as well
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE core_todo_fts USING fts5(
+        title, description, content='core_todo', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER core_todo_fts_insert AFTER INSERT ON core_todo BEGIN
+        INSERT INTO core_todo_fts(rowid, title, description)
+        VALUES (new.id, new.title, coalesce(new.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER core_todo_fts_delete AFTER DELETE ON core_todo BEGIN
+        INSERT INTO core_todo_fts(core_todo_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, coalesce(old.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER core_todo_fts_update AFTER UPDATE OF title, description ON core_todo BEGIN
+        INSERT INTO core_todo_fts(core_todo_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, coalesce(old.description, ''));
+        INSERT INTO core_todo_fts(rowid, title, description)
+        VALUES (new.id, new.title, coalesce(new.description, ''));
+    END
+    """,
+    "INSERT INTO core_todo_fts(core_todo_fts) VALUES ('rebuild')",
+]
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS core_todo_fts_update',
+    'DROP TRIGGER IF EXISTS core_todo_fts_delete',
+    'DROP TRIGGER IF EXISTS core_todo_fts_insert',
+    'DROP TABLE IF EXISTS core_todo_fts',
+]
+
+STATEMENTS = {
+    'postgresql': (POSTGRES_FORWARD, POSTGRES_REVERSE),
+    'sqlite': (SQLITE_FORWARD, SQLITE_REVERSE),
+}
+
+
+def run(direction):
+    def operation(apps, schema_editor):
+        statements = STATEMENTS.get(schema_editor.connection.vendor)
+        # Other databases fall back to icontains in core.search
+        for sql in statements[direction] if statements else []:
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_todo_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(0), run(1)),
+    ]
@@ -1,6 +1,11 @@
-from django.db import models
+import json
+from datetime import date, timedelta
+
+from django.db import models, transaction
 from django.utils import timezone
 
+from . import fragments
+
 # Create your models here.
 
 class Todo(models.Model):
@@ -17,6 +22,9 @@ class Todo(models.Model):
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled'),
     ]
+
+    # Statuses still being worked on (the "open" list filter)
+    OPEN_STATUSES = ['pending', 'in_progress']
     
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
@@ -27,7 +35,125 @@ class Todo(models.Model):
     due_date = models.DateTimeField(blank=True, null=True)
     
     class Meta:
-        ordering = ['-created_at']
+        # id breaks ties between rows created in the same instant, matching
+        # the keyset pagination order
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='todo_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='todo_status_created_idx'),
+            models.Index(fields=['priority', '-created_at', '-id'], name='todo_priority_created_idx'),
+            # Not a partial index on open items: SQLite cannot prove that a
+            # parameterised "status IN (?, ?)" implies the index condition
+            models.Index(fields=['status', 'due_date'], name='todo_status_due_idx'),
+        ]
     
     def __str__(self):
         return self.title
+
+    def delete(self, *args, **kwargs):
+        # Bumped here rather than from a post_delete receiver, which would
+        # stop queryset deletes from being a single DELETE; those (e.g.
+        # todos.apply_bulk) bump the version once themselves
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(fragments.bump_todo_version)
+        return result
+
+
+class LeetCodeQuestion(models.Model):
+    """Local copy of a LeetCode question detail payload"""
+
+    title_slug = models.SlugField(max_length=200, unique=True)
+    question_id = models.CharField(max_length=20, blank=True)
+    frontend_id = models.CharField(max_length=20, blank=True)
+    title = models.CharField(max_length=200)
+    difficulty = models.CharField(max_length=10, blank=True)
+    content = models.TextField(blank=True)
+    stats = models.JSONField(default=dict, blank=True)
+    hints = models.JSONField(default=list, blank=True)
+    topic_tags = models.JSONField(default=list, blank=True)
+    payload = models.JSONField(default=dict)
+    fetched_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ['title_slug']
+
+    def __str__(self):
+        return self.title
+
+    def is_fresh(self, max_age):
+        return timezone.now() - self.fetched_at < timedelta(seconds=max_age)
+
+    @classmethod
+    def store(cls, question):
+        """Create or refresh the row for an upstream `question` payload"""
+        stats = question.get('stats') or {}
+        if isinstance(stats, str):
+            try:
+                stats = json.loads(stats)
+            except ValueError:
+                stats = {}
+        payload = dict(question, stats=stats)
+        obj, _ = cls.objects.update_or_create(
+            title_slug=question['titleSlug'],
+            defaults={
+                'question_id': question.get('questionId') or '',
+                'frontend_id': question.get('questionFrontendId') or '',
+                'title': question.get('title') or '',
+                'difficulty': question.get('difficulty') or '',
+                'content': question.get('content') or '',
+                'stats': stats,
+                'hints': question.get('hints') or [],
+                'topic_tags': question.get('topicTags') or [],
+                'payload': payload,
+                'fetched_at': timezone.now(),
+            },
+        )
+        return obj
+
+
+class DailyChallenge(models.Model):
+    """One LeetCode daily coding challenge, keyed by its date"""
+
+    date = models.DateField(unique=True)
+    link = models.CharField(max_length=255, blank=True)
+    title_slug = models.SlugField(max_length=200, db_index=True)
+    question = models.JSONField(default=dict)
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f'{self.date}: {self.title_slug}'
+
+    def as_challenge(self):
+        """Same shape as an item of `dailyCodingChallengeV2.challenges`"""
+        return {
+            'date': self.date.isoformat(),
+            'link': self.link,
+            'question': self.question,
+        }
+
+    @classmethod
+    def store_many(cls, challenges):
+        """Create or refresh rows for a list of upstream challenge payloads.
+
+        Question fields are merged into what is stored, so the month's card
+        fields do not drop the content a daily fetch saved.
+        """
+        now = timezone.now()
+        dates = [date.fromisoformat(challenge['date']) for challenge in challenges]
+        stored = dict(cls.objects.filter(date__in=dates).values_list('date', 'question'))
+        with transaction.atomic():
+            for challenge in challenges:
+                day = date.fromisoformat(challenge['date'])
+                question = {**stored.get(day, {}), **(challenge.get('question') or {})}
+                cls.objects.update_or_create(
+                    date=day,
+                    defaults={
+                        'link': challenge.get('link') or '',
+                        'title_slug': question.get('titleSlug') or '',
+                        'question': question,
+                        'fetched_at': now,
+                    },
+                )
@@ -0,0 +1,80 @@
+"""
+Keyset (cursor) pagination on (created_at, id).
+
+Pages are selected with a WHERE on the last row seen instead of OFFSET, so
+every page costs the same no matter how deep it is. Cursors are opaque
+url-safe strings encoding one row's (created_at, id).
+
+Ranked search results have no stable key to page on and use numbered
+pages instead (offset_page).
+"""
+
+import base64
+from collections import namedtuple
+from datetime import datetime
+
+from django.db.models import Q
+
+Page = namedtuple('Page', 'items next_cursor prev_cursor')
+
+
+def encode_cursor(obj):
+    raw = f'{obj.created_at.isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) for a cursor, or None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except ValueError:
+        return None
+
+
+def keyset_page(queryset, size, after=None, before=None):
+    """One page of `queryset`, newest first.
+
+    `after` continues past the last row of the previous page, `before` goes
+    back from the first row of the current one. Both are cursors.
+    """
+    after, before = decode_cursor(after), decode_cursor(before)
+    if before is not None:
+        created_at, pk = before
+        rows = list(
+            queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+            .order_by('created_at', 'pk')[:size + 1]
+        )
+        has_prev, has_next = len(rows) > size, True
+        rows = rows[:size][::-1]
+    else:
+        if after is not None:
+            created_at, pk = after
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+        rows = list(queryset.order_by('-created_at', '-pk')[:size + 1])
+        has_prev, has_next = after is not None, len(rows) > size
+        rows = rows[:size]
+
+    return Page(
+        rows,
+        encode_cursor(rows[-1]) if rows and has_next else None,
+        encode_cursor(rows[0]) if rows and has_prev else None,
+    )
+
+
+def offset_page(queryset, size, number):
+    """Page `number` (1-based) of an ordered queryset; cursors are page numbers"""
+    try:
+        number = max(int(number), 1)
+    except (TypeError, ValueError):
+        number = 1
+    offset = (number - 1) * size
+    rows = list(queryset[offset:offset + size + 1])
+    return Page(
+        rows[:size],
+        number + 1 if len(rows) > size else None,
+        number - 1 if number > 1 else None,
+    )
@@ -0,0 +1,106 @@
+"""
+Per-request timing breakdown used by core.middleware.ProfilingMiddleware.
+
+While a request is being profiled, a RequestProfile sits in a context
+variable. SQL, LeetCode HTTP calls, JSON decoding and template rendering
+report into it through record()/timer(); outside a profiled request those
+are no-ops. sync_to_async copies the context, so work done in its threads
+is counted too; background refresh threads are not.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.template.backends import django as django_backend
+
+_current = ContextVar('request_profile', default=None)
+
+# Reported in this order in Server-Timing and the log line
+KINDS = ('db', 'upstream', 'decode', 'template')
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = {kind: 0.0 for kind in KINDS}
+        self.counts = {kind: 0 for kind in KINDS}
+        self._lock = threading.Lock()
+
+    def add(self, kind, seconds):
+        with self._lock:
+            self.timings[kind] = self.timings.get(kind, 0.0) + seconds
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        parts = [f'total;dur={total * 1000:.1f}']
+        for kind, seconds in self.timings.items():
+            if self.counts[kind]:
+                parts.append(f'{kind};dur={seconds * 1000:.1f};desc="{self.counts[kind]} calls"')
+        return ', '.join(parts)
+
+    def as_dict(self, total):
+        data = {'total_ms': round(total * 1000, 1)}
+        for kind, seconds in self.timings.items():
+            data[f'{kind}_ms'] = round(seconds * 1000, 1)
+            data[f'{kind}_count'] = self.counts[kind]
+        return data
+
+
+def start():
+    """Begin profiling the current request; returns (profile, token for stop())"""
+    profile = RequestProfile()
+    return profile, _current.set(profile)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def record(kind, seconds):
+    profile = _current.get()
+    if profile is not None:
+        profile.add(kind, seconds)
+
+
+@contextmanager
+def timer(kind):
+    if _current.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, time.perf_counter() - started)
+
+
+def _sql_timer(execute, sql, params, many, context):
+    with timer('db'):
+        return execute(sql, params, many, context)
+
+
+def install_sql_timer(connection, **kwargs):
+    """connection_created receiver; also called for connections already open"""
+    if _sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_sql_timer)
+
+
+class TimedTemplate(django_backend.Template):
+    def render(self, context=None, request=None):
+        with timer('template'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The Django template backend, timing each render for the profiler"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
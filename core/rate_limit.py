@@ -0,0 +1,151 @@
+"""
+Token buckets kept in the Django cache, shared by every worker when the
+cache is (REDIS_URL, CACHE_DIR).
+
+Used for the outbound LeetCode request budget (core.leetcode) and for
+per-client limits on inbound routes (client_ip(), limit_ip(), check_ip()).
+"""
+
+import asyncio
+import os
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .metrics import RATE_LIMITED
+
+
+DUMMY_BACKEND = 'django.core.cache.backends.dummy.DummyCache'
+# Backends whose data lives in one worker process
+LOCAL_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache', DUMMY_BACKEND)
+
+
+def worker_share(cache_alias):
+    """Share of an instance-wide budget one worker may spend: all of it when
+    the cache is shared between workers, else 1 / WEB_CONCURRENCY"""
+    if settings.CACHES[cache_alias]['BACKEND'] in LOCAL_BACKENDS:
+        return 1 / max(int(os.environ.get('WEB_CONCURRENCY') or 1), 1)
+    return 1
+
+
+class TokenBucket:
+    """Allow `rate` calls per second on average and bursts of up to `burst`.
+
+    The bucket is a single counter of tokens spent, compared with the
+    number of tokens dripped in since the epoch (time * rate); the difference
+    is how much of the burst is in use. Only incr/decr touch the counter:
+    with Redis these are atomic and every worker of every instance shares
+    the bucket. The file cache is shared by the instance's workers but its
+    incr is a read and a write, so concurrent calls can lose a token now
+    and then. With the per-process locmem cache each worker has its own
+    bucket, scaled by worker_share() so the instance stays within `rate`.
+    A rate of 0 disables the limit.
+    """
+
+    def __init__(self, name, rate, burst, cache_alias='default', timeout=None):
+        share = worker_share(cache_alias)
+        self.name = name
+        self.rate = rate * share
+        self.burst = max(int(burst * share), 1)
+        self.cache_alias = cache_alias
+        # Idle buckets may expire; they come back full, which is what they
+        # would be anyway after burst / rate seconds
+        self.timeout = timeout
+        self.key = f'ratelimit:{name}'
+        # The dummy cache cannot count; it means no limit, as it means no caching
+        self.enabled = bool(rate) and settings.CACHES[cache_alias]['BACKEND'] != DUMMY_BACKEND
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def take(self):
+        """Take a token; returns 0 on success, else seconds until one is available"""
+        if not self.enabled:
+            return 0
+        cache = self.cache
+        dripped = int(time.time() * self.rate)
+        try:
+            spent = cache.incr(self.key)
+        except ValueError:
+            cache.add(self.key, dripped, timeout=self.timeout)
+            spent = cache.incr(self.key)
+
+        if spent <= dripped:
+            # The bucket was full; unused tokens past the burst are lost
+            cache.incr(self.key, dripped + 1 - spent)
+            return 0
+        if spent - dripped <= self.burst:
+            return 0
+        cache.decr(self.key)
+        return (spent - dripped - self.burst) / self.rate
+
+    def acquire(self, max_wait=0):
+        """Take a token, sleeping up to `max_wait` seconds for one; False if none came"""
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self.take()
+            if not wait:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    async def aacquire(self, max_wait=0):
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = await sync_to_async(self.take)()
+            if not wait:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+def client_ip(request):
+    """The client's address: REMOTE_ADDR, or the last hop in CLIENT_IP_HEADER
+    (e.g. HTTP_X_FORWARDED_FOR) when running behind a proxy that sets it"""
+    if settings.CLIENT_IP_HEADER and request.META.get(settings.CLIENT_IP_HEADER):
+        return request.META[settings.CLIENT_IP_HEADER].split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+class RateLimited(Exception):
+    """Raised by limit_ip() when a client has used up its `name` budget"""
+
+    def __init__(self, name, wait):
+        super().__init__(f'{name} rate limit exceeded')
+        self.name = name
+        self.wait = wait
+
+    def response(self):
+        """The 429 to send, with Retry-After"""
+        retry_after = max(int(self.wait) + 1, 1)
+        return HttpResponse(
+            'Too many requests, slow down.', status=429, content_type='text/plain',
+            headers={'Retry-After': str(retry_after)},
+        )
+
+
+def limit_ip(request, name, rate, burst):
+    """Take a token from this client's `name` budget; raises RateLimited if there is none"""
+    bucket = TokenBucket(
+        f'{name}:{client_ip(request)}', rate, burst,
+        timeout=max(int(burst / rate) * 10, 60) if rate else None,
+    )
+    wait = bucket.take()
+    if wait:
+        RATE_LIMITED.inc(name)
+        raise RateLimited(name, wait)
+
+
+def check_ip(request, name, rate, burst):
+    """A 429 response if this client has used up its `name` budget, else None"""
+    try:
+        limit_ip(request, name, rate, burst)
+    except RateLimited as e:
+        return e.response()
+    return None
@@ -0,0 +1,65 @@
+"""
+Ranked full-text search over todo titles and descriptions.
+
+Uses the index created by migration 0004: a GIN-indexed tsvector column on
+PostgreSQL and an FTS5 table on SQLite. Other databases fall back to an
+unranked icontains scan.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts5_query(text):
+    """Turn user input into an FTS5 query: every word must match, as a prefix.
+
+    Quoting each word keeps FTS5 operators and punctuation in the input from
+    being parsed as query syntax.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD_RE.findall(text))
+
+
+def tsquery(text):
+    """The PostgreSQL counterpart of fts5_query(): 'word:* & word:*'"""
+    return ' & '.join(f'{word}:*' for word in WORD_RE.findall(text))
+
+
+def search(queryset, text):
+    """Filter a Todo queryset to matches for `text`, annotated with `rank`
+    (higher is better) and ordered by it."""
+    text = text.strip()
+    if connection.vendor == 'postgresql':
+        match = tsquery(text)
+        if not match:
+            return queryset.none()
+        query = "to_tsquery('english', %s)"
+        return queryset.filter(
+            RawSQL(f'core_todo.search_vector @@ {query}', [match], output_field=BooleanField())
+        ).annotate(
+            rank=RawSQL(f'ts_rank(core_todo.search_vector, {query})', [match], output_field=FloatField())
+        ).order_by('-rank', '-id')
+
+    if connection.vendor == 'sqlite':
+        match = fts5_query(text)
+        if not match:
+            return queryset.none()
+        # bm25() is only available inside the MATCH query itself, and lower
+        # is better; title hits weigh 10x description hits
+        return queryset.filter(
+            id__in=RawSQL('SELECT rowid FROM core_todo_fts WHERE core_todo_fts MATCH %s', [match])
+        ).annotate(
+            rank=RawSQL(
+                'SELECT -bm25(core_todo_fts, 10.0, 1.0) FROM core_todo_fts '
+                'WHERE core_todo_fts MATCH %s AND core_todo_fts.rowid = core_todo.id',
+                [match], output_field=FloatField(),
+            )
+        ).order_by('-rank', '-id')
+
+    return queryset.filter(
+        Q(title__icontains=text) | Q(description__icontains=text)
+    ).annotate(rank=Value(0.0, output_field=FloatField()))
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from . import fragments
+from .models import Todo
+
+
+@receiver(post_save, sender=Todo)
+def invalidate_todo_fragments(sender, **kwargs):
+    # Queryset update(), bulk_create(), queryset delete() and the importer
+    # send no signals and bump the version themselves; Todo.delete() bumps
+    # it too, as a post_delete receiver would rule out fast deletes
+    fragments.bump_todo_version()
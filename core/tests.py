@@ -1,3 +1,1216 @@
-from django.test import TestCase
+import asyncio
+import itertools
+import json
+import os
+import runpy
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import django
+import httpx
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import conditional, fragments, leetcode, leetcode_cache, leetcode_queries, leetcode_render, metrics, rate_limit, search, todos
+from .leetcode_client import AsyncLeetCodeClient, LeetCodeClient, get_async_client
+from .management.commands import importtime
+from .models import DailyChallenge, LeetCodeQuestion, Todo
+
+
+QUESTION = {
+    'title': 'Two Sum',
+    'titleSlug': 'two-sum',
+    'questionFrontendId': '1',
+    'difficulty': 'Easy',
+    'content': '<p>Find two numbers.</p>',
+    'stats': '{"acRate": 50.0, "totalAccepted": "10", "totalSubmission": "20"}',
+    'topicTags': [{'name': 'Array'}],
+}
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class LeetCodeCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_cache_key_is_per_query_and_variables(self):
+        key = leetcode_cache.cache_key('questionContent', {'titleSlug': 'two-sum'})
+        self.assertEqual(key, leetcode_cache.cache_key('questionContent', {'titleSlug': 'two-sum'}))
+        self.assertNotEqual(key, leetcode_cache.cache_key('questionContent', {'titleSlug': 'add-two-numbers'}))
+        self.assertNotEqual(key, leetcode_cache.cache_key('questionOfToday', {'titleSlug': 'two-sum'}))
+
+    def test_seconds_until_utc_midnight(self):
+        now = datetime(2025, 9, 5, 23, 59, 0, tzinfo=dt_timezone.utc)
+        self.assertEqual(leetcode_cache.seconds_until_utc_midnight(now), 60)
+
+    def test_fetch_counts_hits_and_misses(self):
+        fetch = mock.Mock(return_value=QUESTION)
+        leetcode_cache.get_or_fetch('questionContent', {'titleSlug': 'two-sum'}, fetch, timeout=60)
+        cached = leetcode_cache.get_or_fetch('questionContent', {'titleSlug': 'two-sum'}, fetch, timeout=60)
+
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(cached.value, QUESTION)
+        self.assertFalse(cached.stale)
+        self.assertEqual(leetcode.cache_stats()['questionContent']['hits'], 1)
+        self.assertEqual(leetcode.cache_stats()['questionContent']['misses'], 1)
+
+    def test_errors_are_not_cached(self):
+        with mock.patch.object(leetcode, 'graphql', side_effect=leetcode.LeetCodeError('Failed to fetch data: 502')) as graphql:
+            response = self.client.get(reverse('leetcode_daily'))
+            self.client.get(reverse('leetcode_daily'))
+
+        self.assertContains(response, 'Failed to fetch data: 502')
+        self.assertEqual(graphql.call_count, 2)
+
+    def test_expired_entry_is_served_while_refreshing(self):
+        fetch = mock.Mock(return_value=QUESTION)
+        leetcode_cache.get_or_fetch('questionContent', {'titleSlug': 'two-sum'}, fetch, timeout=60)
+
+        later = timezone.now() + timedelta(minutes=5)
+        with mock.patch.object(leetcode_cache, 'refresh_in_background') as refresh, \
+                mock.patch('django.utils.timezone.now', return_value=later):
+            cached = leetcode_cache.get_or_fetch('questionContent', {'titleSlug': 'two-sum'}, fetch, timeout=60)
+
+        self.assertTrue(cached.stale)
+        self.assertEqual(cached.value, QUESTION)
+        self.assertEqual(fetch.call_count, 1)
+        refresh.assert_called_once()
+
+
+    def test_daily_entry_stays_fresh_until_midnight(self):
+        fetched = datetime(2025, 9, 5, 0, 5, tzinfo=dt_timezone.utc)
+        fetch = mock.Mock(return_value=QUESTION)
+        with mock.patch('django.utils.timezone.now', return_value=fetched):
+            leetcode_cache.get_or_fetch(
+                'questionOfToday', {'date': 'x'}, fetch, timeout=leetcode_cache.seconds_until_utc_midnight(fetched),
+            )
+
+        noon = fetched.replace(hour=12)
+        with mock.patch('django.utils.timezone.now', return_value=noon), \
+                mock.patch.object(leetcode_cache, 'refresh_in_background') as refresh:
+            cached = leetcode_cache.get_or_fetch(
+                'questionOfToday', {'date': 'x'}, fetch, timeout=leetcode_cache.seconds_until_utc_midnight(noon),
+            )
+
+        self.assertFalse(cached.stale)
+        refresh.assert_not_called()
+        self.assertEqual(fetch.call_count, 1)
+
+
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_threads_share_one_fetch(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {'title': 'Two Sum'}
+
+        results = []
+
+        def worker():
+            results.append(leetcode_cache.get_or_fetch('questionOfToday', {'date': 'x'}, fetch, timeout=60).value)
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'title': 'Two Sum'}] * 5)
+
+    def test_waits_for_fetch_in_another_process(self):
+        key = leetcode_cache.cache_key('questionOfToday', {'date': 'x'})
+        cache.add(f'{key}:lock', 1)
+        entry = {'value': {'title': 'Two Sum'}, 'fetched_at': timezone.now()}
+        threading.Timer(0.1, cache.set, args=(key, entry)).start()
+        fetch = mock.Mock()
+
+        cached = leetcode_cache.get_or_fetch('questionOfToday', {'date': 'x'}, fetch, timeout=60)
+
+        self.assertEqual(cached.value, {'title': 'Two Sum'})
+        fetch.assert_not_called()
+
+    def test_concurrent_coroutines_share_one_fetch(self):
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {'title': 'Two Sum'}
+
+        async def main():
+            return await asyncio.gather(*(
+                leetcode_cache.aget_or_fetch('questionOfToday', {'date': 'x'}, fetch, timeout=60, sync_fetch=None)
+                for _ in range(5)
+            ))
+
+        results = [cached.value for cached in asyncio.run(main())]
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'title': 'Two Sum'}] * 5)
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class LeetCodeStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_detail_view_reads_stored_question(self):
+        with mock.patch.object(leetcode, 'graphql', return_value={'question': QUESTION}) as graphql:
+            url = reverse('leetcode_question_detail', args=['two-sum'])
+            self.client.get(url)
+            cache.clear()
+            response = self.client.get(url)
+
+        self.assertEqual(graphql.call_count, 1)
+        self.assertContains(response, 'Two Sum')
+        stored = LeetCodeQuestion.objects.get(title_slug='two-sum')
+        self.assertEqual(stored.stats['totalAccepted'], '10')
+
+    async def test_asgi_requests_use_the_async_client(self):
+        with mock.patch.object(leetcode, 'agraphql', return_value={'question': QUESTION}) as agraphql, \
+                mock.patch.object(leetcode, 'graphql') as graphql:
+            response = await self.async_client.get(reverse('leetcode_question_detail', args=['two-sum']))
+
+        self.assertContains(response, 'Two Sum')
+        agraphql.assert_called_once()
+        graphql.assert_not_called()
+
+    def test_stale_question_is_served_while_refreshing(self):
+        LeetCodeQuestion.store(QUESTION)
+        LeetCodeQuestion.objects.update(fetched_at=timezone.now() - timedelta(days=1))
+
+        with mock.patch.object(leetcode_cache, 'refresh_in_background') as refresh, \
+                mock.patch.object(leetcode, 'graphql') as graphql:
+            response = self.client.get(reverse('leetcode_question_detail', args=['two-sum']))
+
+        self.assertContains(response, 'Two Sum')
+        self.assertContains(response, 'Showing saved data from 1')
+        self.assertContains(response, '<div class="notice">')
+        refresh.assert_called_once()
+        graphql.assert_not_called()
+
+    def test_recent_view_falls_back_to_stored_challenges(self):
+        DailyChallenge.store_many([{'date': '2025-09-05', 'link': '/problems/two-sum/', 'question': QUESTION}])
+
+        with mock.patch.object(leetcode, 'graphql', side_effect=leetcode.LeetCodeError('Network error: timed out')):
+            response = self.client.get(reverse('leetcode_recent'))
+
+        self.assertContains(response, 'Two Sum')
+        self.assertContains(response, 'Showing saved data')
+        self.assertNotContains(response, 'Sample Problem')
+
+    def test_recent_view_reads_stored_month(self):
+        today = timezone.now().date()
+        challenges = [
+            {'date': today.replace(day=day).isoformat(), 'link': '/problems/two-sum/', 'question': QUESTION}
+            for day in range(1, today.day + 1)
+        ]
+        with mock.patch.object(leetcode, 'graphql', return_value={'dailyCodingChallengeV2': {'challenges': challenges}}) as graphql:
+            self.client.get(reverse('leetcode_recent'))
+            cache.clear()
+            response = self.client.get(reverse('leetcode_recent'))
+
+        self.assertEqual(graphql.call_count, 1)
+        self.assertContains(response, 'Two Sum')
+        self.assertTrue(DailyChallenge.objects.filter(date=today, title_slug='two-sum').exists())
+
+
+    def test_daily_row_does_not_pass_for_the_month(self):
+        today = timezone.now().date()
+        challenges = [
+            {'date': today.replace(day=day).isoformat(), 'link': '/problems/two-sum/', 'question': QUESTION}
+            for day in range(1, today.day + 1)
+        ]
+
+        def fake_graphql(query, variables=None):
+            if query == leetcode.DAILY_QUESTION_QUERY:
+                return {'activeDailyCodingChallengeQuestion': challenges[-1]}
+            return {'dailyCodingChallengeV2': {'challenges': challenges}}
+
+        with mock.patch.object(leetcode, 'graphql', side_effect=fake_graphql) as graphql:
+            leetcode.get_daily_challenge()
+            result = leetcode.get_month_challenges(today.year, today.month)
+
+        self.assertEqual(graphql.call_count, 2)
+        self.assertEqual(len(result.value), today.day)
+        self.assertEqual(DailyChallenge.objects.count(), today.day)
+
+
+class PrefetchCommandTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def fake_graphql(self, query, variables=None):
+        today = timezone.now().date().isoformat()
+        if query is leetcode.DAILY_QUESTION_QUERY:
+            return {'activeDailyCodingChallengeQuestion': {'date': today, 'link': '/problems/two-sum/', 'question': QUESTION}}
+        if query is leetcode.RECENT_QUESTIONS_QUERY:
+            day = timezone.now().date()
+            challenges = [
+                {'date': day.replace(day=d).isoformat(), 'link': '/problems/two-sum/', 'question': QUESTION}
+                for d in range(1, day.day + 1)
+            ]
+            return {'dailyCodingChallengeV2': {'challenges': challenges}}
+        return {alias: dict(QUESTION, titleSlug=slug) for alias, slug in zip(['q0', 'q1'], variables.values())}
+
+    def test_prefetch_is_incremental(self):
+        out = StringIO()
+        with mock.patch.object(leetcode, 'graphql', side_effect=self.fake_graphql) as graphql:
+            call_command('prefetch_leetcode', stdout=out)
+            self.assertTrue(LeetCodeQuestion.objects.filter(title_slug='two-sum').exists())
+            calls = graphql.call_count
+            call_command('prefetch_leetcode', stdout=out)
+
+        self.assertEqual(graphql.call_count, calls)
+        self.assertIn('1 fresh, 0 to fetch', out.getvalue())
+
+
+    def test_daily_comes_from_the_stored_row(self):
+        today = timezone.now().date().isoformat()
+        daily = {'date': today, 'link': '/problems/two-sum/', 'question': QUESTION}
+        DailyChallenge.store_many([daily])
+        # A month fetch stores card fields only; the content must survive it
+        DailyChallenge.store_many([dict(daily, question={'title': 'Two Sum', 'titleSlug': 'two-sum'})])
+
+        with mock.patch.object(leetcode, 'graphql') as graphql:
+            result = leetcode.get_daily_challenge()
+
+        graphql.assert_not_called()
+        self.assertEqual(result.value['question']['content'], QUESTION['content'])
+        self.assertFalse(result.stale)
+
+    def test_stale_month_fallback_is_reported_as_failure(self):
+        DailyChallenge.store_many([{'date': '2020-01-01', 'link': '/problems/two-sum/', 'question': QUESTION}])
+        out, err = StringIO(), StringIO()
+
+        def fake_graphql(query, variables=None):
+            if query is leetcode.RECENT_QUESTIONS_QUERY:
+                raise leetcode.LeetCodeError('Network error: timed out')
+            return self.fake_graphql(query, variables)
+
+        with mock.patch.object(leetcode, 'graphql', side_effect=fake_graphql), \
+                self.assertRaisesMessage(CommandError, 'prefetch incomplete'):
+            call_command('prefetch_leetcode', stdout=out, stderr=err)
+
+        self.assertIn('month failed', err.getvalue())
+        self.assertRegex(out.getvalue(), r'month \S+ failed after')
+        self.assertNotRegex(out.getvalue(), r'month \S+ done')
+
+class QueryBuilderTests(TestCase):
+    def test_detail_query_selects_only_rendered_fields(self):
+        query = leetcode_queries.question_query()
+        self.assertIn('question(titleSlug: $titleSlug)', query)
+        self.assertIn('sampleTestCase', query)
+        for unused in ('codeSnippets', 'mysqlSchemas', 'envInfo', 'companyTagStats'):
+            self.assertNotIn(unused, query)
+
+    def test_batch_query_aliases_each_slug(self):
+        query, variables, aliases = leetcode_queries.question_batch_query(['two-sum', 'add-two-numbers'], ['title'])
+        self.assertIn('q0: question(titleSlug: $s0)', query)
+        self.assertIn('q1: question(titleSlug: $s1)', query)
+        self.assertEqual(variables, {'s0': 'two-sum', 's1': 'add-two-numbers'})
+
+        data = {'q0': {'title': 'Two Sum'}, 'q1': None}
+        with mock.patch.object(leetcode, 'graphql', return_value=data):
+            self.assertEqual(leetcode.fetch_questions(['two-sum', 'add-two-numbers']), {'two-sum': {'title': 'Two Sum'}})
+
+
+class LeetCodeRenderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_sanitize_strips_scripts_handlers_and_bad_urls(self):
+        html = (
+            '<p onclick="x()">Hi <script>alert(1)</script><a href="javascript:x()">a</a>'
+            '<img src="https://assets.leetcode.com/x.png" onerror="y()"><b>bold'
+        )
+        self.assertEqual(
+            leetcode_render.sanitize_html(html),
+            '<p>Hi <a rel="nofollow noopener" target="_blank">a</a>'
+            '<img src="https://assets.leetcode.com/x.png"><b>bold</b></p>',
+        )
+
+    def test_body_is_rendered_once_per_content_version(self):
+        with mock.patch.object(leetcode_render, 'render_to_string', wraps=leetcode_render.render_to_string) as render:
+            first = leetcode_render.question_body(QUESTION)
+            leetcode_render.question_body(dict(QUESTION))
+            changed = leetcode_render.question_body(dict(QUESTION, content='<p>Find three numbers.</p>'))
+
+        self.assertEqual(render.call_count, 2)
+        self.assertIn('Find two numbers.', first)
+        self.assertIn('50.0%', first)
+        self.assertIn('Find three numbers.', changed)
+
+    @override_settings(SECURE_SSL_REDIRECT=False)
+    def test_daily_page_sanitizes_content(self):
+        question = dict(QUESTION, content='<p>Find two numbers.<script>alert(1)</script></p><img src=x onerror="y()">')
+        daily = {'date': '2025-09-05', 'link': '/problems/two-sum/', 'question': question}
+        with mock.patch.object(leetcode, 'graphql', return_value={'activeDailyCodingChallengeQuestion': daily}):
+            response = self.client.get(reverse('leetcode_daily'))
+
+        self.assertContains(response, '<p>Find two numbers.</p>')
+        self.assertNotContains(response, 'alert(1)')
+        self.assertNotContains(response, 'onerror')
+
+
+@override_settings(LEETCODE_BREAKER_THRESHOLD=2, LEETCODE_BREAKER_COOLDOWN=60)
+class CircuitBreakerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_opens_after_consecutive_failures(self):
+        client = mock.Mock()
+        client.post.return_value = mock.Mock(status_code=503)
+        with mock.patch.object(leetcode, 'get_client', return_value=client):
+            for _ in range(2):
+                with self.assertRaises(leetcode.LeetCodeError):
+                    leetcode.graphql(leetcode.DAILY_QUESTION_QUERY)
+            with self.assertRaises(leetcode.LeetCodeUnavailable):
+                leetcode.graphql(leetcode.DAILY_QUESTION_QUERY)
+
+        self.assertEqual(client.post.call_count, 2)
+        self.assertEqual(leetcode.breaker_state(), 'open')
+
+    def test_success_resets_failures(self):
+        breaker = leetcode.get_breaker()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state(), 'closed')
+
+    def test_failed_trial_reopens_immediately(self):
+        breaker = leetcode.get_breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        cache.delete(breaker.open_key)  # cool-down elapsed
+        self.assertEqual(breaker.state(), 'half-open')
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state(), 'open')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bucket_allows_burst_then_refills(self):
+        bucket = rate_limit.TokenBucket('test', rate=2, burst=3)
+        with mock.patch.object(time, 'time', return_value=1000.0):
+            self.assertEqual([bucket.take() for _ in range(3)], [0, 0, 0])
+            self.assertEqual(bucket.take(), 0.5)
+            self.assertFalse(bucket.acquire(max_wait=0.1))
+        with mock.patch.object(time, 'time', return_value=1000.5):
+            self.assertEqual(bucket.take(), 0)
+            self.assertTrue(bucket.take())
+        # A long idle period refills the burst, not more
+        with mock.patch.object(time, 'time', return_value=2000.0):
+            self.assertEqual([bucket.take() for _ in range(3)], [0, 0, 0])
+            self.assertTrue(bucket.take())
+
+    def test_per_process_cache_splits_the_budget_between_workers(self):
+        with mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '4'}):
+            local = rate_limit.TokenBucket('test', rate=2, burst=20)
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+                shared = rate_limit.TokenBucket('test', rate=2, burst=20)
+
+        self.assertEqual((local.rate, local.burst), (0.5, 5))
+        self.assertEqual((shared.rate, shared.burst), (2, 20))
+
+    @override_settings(LEETCODE_RATE_BURST=1, LEETCODE_RATE_WAIT=0)
+    def test_graphql_stops_at_the_request_budget(self):
+        client = mock.Mock()
+        client.post.return_value = mock.Mock(status_code=200, json=lambda: {'data': {}})
+        with mock.patch.object(leetcode, 'get_client', return_value=client):
+            leetcode.graphql(leetcode.DAILY_QUESTION_QUERY)
+            with self.assertRaises(leetcode.LeetCodeRateLimited):
+                leetcode.graphql(leetcode.DAILY_QUESTION_QUERY)
+
+        self.assertEqual(client.post.call_count, 1)
+        self.assertEqual(leetcode.breaker_state(), 'closed')
+        self.assertIn('rate_limited_total{limiter="leetcode"} 1', metrics.render())
+
+    def test_missing_questions_are_negative_cached(self):
+        with mock.patch.object(leetcode, 'graphql', return_value={'question': None}) as graphql:
+            for slug in ['no-such-question', 'no-such-question', 'Bad Slug', 'TWO_SUM']:
+                response = self.client.get(reverse('leetcode_question_detail', args=[slug]))
+                self.assertContains(response, 'Question not found')
+
+        graphql.assert_called_once()
+
+    @override_settings(LEETCODE_DETAIL_IP_RATE=0.01, LEETCODE_DETAIL_IP_BURST=2)
+    def test_detail_is_limited_per_client(self):
+        def url(i):
+            return reverse('leetcode_question_detail', args=[f'missing-{i}'])
+
+        with mock.patch.object(leetcode, 'graphql', return_value={'question': None}) as graphql:
+            statuses = [self.client.get(url(i)).status_code for i in range(3)]
+            refused = self.client.get(url(3))
+            other = self.client.get(url(4), REMOTE_ADDR='10.0.0.2')
+
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(refused.status_code, 429)
+        self.assertGreater(int(refused['Retry-After']), 0)
+        self.assertEqual(other.status_code, 200)
+        self.assertEqual(graphql.call_count, 3)
+
+    @override_settings(LEETCODE_DETAIL_IP_RATE=0.01, LEETCODE_DETAIL_IP_BURST=1)
+    def test_stored_questions_do_not_count_against_the_limit(self):
+        LeetCodeQuestion.store(QUESTION)
+        url = reverse('leetcode_question_detail', args=['two-sum'])
+        statuses = [self.client.get(url).status_code for _ in range(3)]
+        missing = reverse('leetcode_question_detail', args=['missing'])
+        with mock.patch.object(leetcode, 'graphql', return_value={'question': None}):
+            statuses.append(self.client.get(missing).status_code)
+
+        self.assertEqual(statuses, [200, 200, 200, 200])
+
+    @override_settings(CLIENT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_client_ip_uses_the_last_proxy_hop(self):
+        request = mock.Mock(META={'REMOTE_ADDR': '10.0.0.1', 'HTTP_X_FORWARDED_FOR': '1.2.3.4, 5.6.7.8'})
+        self.assertEqual(rate_limit.client_ip(request), '5.6.7.8')
+
+
+class LeetCodeClientTests(TestCase):
+    def test_session_is_pooled_with_retries(self):
+        client = LeetCodeClient(pool_size=5, max_retries=3)
+        adapter = client.session.get_adapter('https://leetcode.com/graphql/')
+        self.assertEqual(adapter._pool_maxsize, 5)
+        self.assertEqual(adapter.max_retries.connect, 3)
+        self.assertFalse(adapter.max_retries.is_retry('POST', 503, has_retry_after=True))
+        self.assertIn('gzip', client.session.headers['Accept-Encoding'])
+
+    def test_retries_take_tokens_and_skip_429(self):
+        client = LeetCodeClient(max_retries=2, backoff_factor=0)
+        limiter = rate_limit.TokenBucket('test', rate=0.001, burst=2)
+        limiter.take()
+        with mock.patch.object(client.session, 'post', return_value=mock.Mock(status_code=503)) as post:
+            client.post({'query': '{}'}, 'questionContent', limiter=limiter)
+        # One retry, paid with the bucket's last token
+        self.assertEqual(post.call_count, 2)
+
+        with mock.patch.object(client.session, 'post', return_value=mock.Mock(status_code=429)) as post:
+            client.post({'query': '{}'}, 'questionContent')
+        self.assertEqual(post.call_count, 1)
+
+    def test_records_latency_per_operation(self):
+        client = LeetCodeClient(max_retries=0)
+        with mock.patch.object(client.session, 'post', return_value=mock.Mock(status_code=503)):
+            client.post({'query': '{}'}, 'questionContent')
+
+        metrics = leetcode.client_metrics()['questionContent']
+        self.assertEqual(metrics['calls'], 1)
+        self.assertEqual(metrics['errors'], 1)
+
+    def test_async_client_retries_503(self):
+        statuses = iter([503, 200])
+        transport = httpx.MockTransport(lambda request: httpx.Response(next(statuses), json={'data': {}}))
+        client = AsyncLeetCodeClient(max_retries=2, backoff_factor=0)
+        client.client = httpx.AsyncClient(transport=transport)
+
+        response = async_to_sync(client.post)({'query': '{}'}, 'questionOfToday')
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_async_client_is_closed_with_its_loop(self):
+        async def get():
+            return await get_async_client()
+
+        client = asyncio.run(get())
+        self.assertTrue(client.client.is_closed)
+        self.assertIsNot(asyncio.run(get()), client)
+
+    def test_operation_name(self):
+        self.assertEqual(leetcode.operation_name(leetcode.QUESTION_CONTENT_QUERY), 'questionContent')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class TodoListTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        Todo.objects.bulk_create([
+            Todo(title=f'Todo {i}', status='completed' if i % 2 else 'pending', due_date=now + timedelta(days=i))
+            for i in range(7)
+        ])
+        # Same created_at for every row, so the id tie-breaker decides the order
+        Todo.objects.update(created_at=now)
+
+    def titles(self, response):
+        return [todo.title for todo in response.context['todos']]
+
+    def test_pages_walk_forward_and_back_without_overlap(self):
+        url = reverse('todo_list')
+        first = self.client.get(url, {'per_page': 3})
+        second = self.client.get(url, {'per_page': 3, 'after': first.context['page'].next_cursor})
+        third = self.client.get(url, {'per_page': 3, 'after': second.context['page'].next_cursor})
+        back = self.client.get(url, {'per_page': 3, 'before': second.context['page'].prev_cursor})
+
+        self.assertEqual(self.titles(first), ['Todo 6', 'Todo 5', 'Todo 4'])
+        self.assertEqual(self.titles(second), ['Todo 3', 'Todo 2', 'Todo 1'])
+        self.assertEqual(self.titles(third), ['Todo 0'])
+        self.assertIsNone(third.context['page'].next_cursor)
+        self.assertEqual(self.titles(back), self.titles(first))
+        self.assertIsNone(back.context['page'].prev_cursor)
+
+    def test_page_query_does_not_grow_with_depth(self):
+        first = self.client.get(reverse('todo_list'), {'per_page': 2})
+        # The ETag aggregate plus the page itself
+        with self.assertNumQueries(2):
+            self.client.get(reverse('todo_list'), {'per_page': 2, 'after': first.context['page'].next_cursor})
+
+    def test_filters(self):
+        today = timezone.localdate()
+        response = self.client.get(reverse('todo_list'), {
+            'status': 'completed',
+            'due_from': (today + timedelta(days=2)).isoformat(),
+            'due_to': (today + timedelta(days=5)).isoformat(),
+            'priority': 'bogus',
+        })
+
+        self.assertEqual(self.titles(response), ['Todo 5', 'Todo 3'])
+        self.assertNotIn('priority', response.context['filters'])
+
+    def test_bad_cursor_shows_first_page(self):
+        response = self.client.get(reverse('todo_list'), {'after': 'not-a-cursor', 'per_page': 2})
+        self.assertEqual(self.titles(response), ['Todo 6', 'Todo 5'])
+
+
+class TodoIndexTests(TestCase):
+    """The list and filter queries must be answered from an index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Todo.objects.bulk_create([
+            Todo(title=f'Todo {i}', status=Todo.STATUS_CHOICES[i % 4][0], due_date=timezone.now() + timedelta(days=i))
+            for i in range(200)
+        ])
+
+    def plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            # The planner prefers a sequential scan on a table this small
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        return queryset.explain()
+
+    def assertUsesIndex(self, queryset, index):
+        plan = self.plan(queryset)
+        self.assertIn(index, plan)
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan)
+        else:
+            # A sort step would mean the index does not match the ordering
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_list_query(self):
+        self.assertUsesIndex(Todo.objects.all()[:50], 'todo_created_idx')
+
+    def test_status_and_priority_filters(self):
+        self.assertUsesIndex(Todo.objects.filter(status='pending')[:50], 'todo_status_created_idx')
+        self.assertUsesIndex(Todo.objects.filter(priority='high')[:50], 'todo_priority_created_idx')
+
+    def test_open_due_date_filter(self):
+        queryset = Todo.objects.filter(status__in=Todo.OPEN_STATUSES, due_date__lt=timezone.now() + timedelta(days=7))
+        self.assertIn('todo_status_due_idx', self.plan(queryset))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class TodoBulkTests(TestCase):
+    def post(self, payload):
+        return self.client.post(reverse('todo_bulk'), payload, content_type='application/json')
+
+    @override_settings(TODO_API_TOKEN='s3cret')
+    def test_api_clients_use_the_token_instead_of_csrf(self):
+        client = Client(enforce_csrf_checks=True)
+        url = reverse('todo_bulk')
+        payload = {'create': [{'title': 'Scripted'}]}
+
+        self.assertEqual(client.post(url, payload, content_type='application/json').status_code, 403)
+        response = client.post(url, payload, content_type='application/json', headers={'authorization': 'Bearer s3cret'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['created'][0]['ok'])
+
+    def test_mixed_batch_reports_each_item(self):
+        keep, done, gone = (Todo.objects.create(title=t) for t in ('keep', 'done', 'gone'))
+
+        response = self.post({
+            'create': [{'title': 'New', 'priority': 'high', 'due_date': '2025-01-02T09:30'}, {'title': ''}],
+            'update': [{'id': done.pk, 'status': 'completed'}, {'id': 999999, 'status': 'completed'}],
+            'delete': [gone.pk, 'x'],
+        })
+
+        results = response.json()
+        self.assertTrue(results['created'][0]['ok'])
+        self.assertEqual(results['created'][1]['errors'], {'title': 'is required'})
+        self.assertEqual([r['ok'] for r in results['updated']], [True, False])
+        self.assertEqual([r['ok'] for r in results['deleted']], [True, False])
+        self.assertEqual(Todo.objects.get(pk=results['created'][0]['id']).priority, 'high')
+        self.assertEqual(Todo.objects.get(pk=done.pk).status, 'completed')
+        self.assertEqual(Todo.objects.get(pk=keep.pk).status, 'pending')
+        self.assertFalse(Todo.objects.filter(pk=gone.pk).exists())
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def batch(n):
+            ids = [todo.pk for todo in Todo.objects.bulk_create([Todo(title=f'T{i}') for i in range(2 * n)])]
+            return {
+                'create': [{'title': f'N{i}'} for i in range(n)],
+                'update': [{'id': pk, 'status': 'completed'} for pk in ids[:n]],
+                'delete': ids[n:],
+            }
+
+        small, large = batch(2), batch(50)
+        with CaptureQueriesContext(connection) as small_queries:
+            self.post(small)
+        with CaptureQueriesContext(connection) as large_queries:
+            self.post(large)
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_malformed_batch_is_rejected(self):
+        self.assertEqual(self.post({'create': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.post(reverse('todo_bulk'), 'not json', content_type='application/json').status_code, 400)
+        with override_settings(TODO_BULK_MAX_ITEMS=1):
+            self.assertEqual(self.post({'delete': [1, 2]}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('todo_bulk')).status_code, 405)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class TodoApiTests(TestCase):
+    @override_settings(TODO_API_CHUNK_SIZE=2)
+    def test_list_streams_filtered_rows(self):
+        for i in range(5):
+            Todo.objects.create(title=f'Todo {i}', status='completed' if i % 2 else 'pending')
+
+        response = self.client.get(reverse('api_todo_collection'), {'status': 'pending'})
+
+        self.assertTrue(response.streaming)
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 2)
+        results = json.loads(b''.join(chunks))['results']
+        self.assertEqual([todo['title'] for todo in results], ['Todo 4', 'Todo 2', 'Todo 0'])
+        self.assertEqual(set(results[0]), set(todos.FIELDS))
+
+    def test_empty_list(self):
+        response = self.client.get(reverse('api_todo_collection'))
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), {'results': []})
+
+    def test_create_update_delete(self):
+        url = reverse('api_todo_collection')
+        response = self.client.post(url, {'title': 'Write API', 'due_date': '2025-03-01T12:00'}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        item_url = reverse('api_todo_item', args=[response.json()['id']])
+
+        response = self.client.patch(item_url, {'status': 'completed'}, content_type='application/json')
+        self.assertEqual(response.json()['status'], 'completed')
+        self.assertEqual(response.json()['title'], 'Write API')
+        self.assertTrue(response.json()['due_date'].startswith('2025-03-01T12:00'))
+
+        response = self.client.put(item_url, {'title': ''}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('title', response.json()['errors'])
+
+        self.assertEqual(self.client.delete(item_url).status_code, 204)
+        self.assertEqual(self.client.get(item_url).status_code, 404)
+
+    @override_settings(TODO_API_TOKEN='s3cret')
+    def test_writes_need_the_token_or_a_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        url = reverse('api_todo_collection')
+        body = {'title': 'From a script'}
+
+        self.assertEqual(client.post(url, body, content_type='application/json').status_code, 403)
+        response = client.post(url, body, content_type='application/json', headers={'authorization': 'Bearer nope'})
+        self.assertEqual(response.status_code, 401)
+        response = client.post(url, body, content_type='application/json', headers={'authorization': 'Bearer s3cret'})
+        self.assertEqual(response.status_code, 201)
+
+        item_url = reverse('api_todo_item', args=[response.json()['id']])
+        response = client.delete(item_url, headers={'authorization': 'Bearer s3cret'})
+        self.assertEqual(response.status_code, 204)
+
+    def test_list_streams_asynchronously_under_asgi(self):
+        Todo.objects.create(title='Async')
+
+        async def fetch():
+            response = await self.async_client.get(reverse('api_todo_collection'))
+            return response, b''.join([chunk async for chunk in response.streaming_content])
+
+        response, body = async_to_sync(fetch)()
+
+        self.assertTrue(response.is_async)
+        self.assertEqual([todo['title'] for todo in json.loads(body)['results']], ['Async'])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class TodoExportImportTests(TestCase):
+    def setUp(self):
+        Todo.objects.create(title='Plain', description='line one\nline, two')
+        Todo.objects.create(title='Due', priority='high', status='completed', due_date=timezone.now())
+        Todo.objects.update(created_at=datetime(2024, 5, 1, 12, 0, tzinfo=dt_timezone.utc))
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmpdir = tmp.name
+
+    def round_trip(self, fmt, **import_options):
+        path = f'{self.tmpdir}/todos.{fmt}'
+        call_command('export_todos', format=fmt, output=path)
+        call_command('import_todos', path, stdout=StringIO(), **import_options)
+
+    def test_round_trip_inserts_copies(self):
+        for fmt in ('csv', 'ndjson'):
+            with self.subTest(fmt=fmt):
+                before = Todo.objects.count()
+                self.round_trip(fmt, batch_size=1)
+                self.assertEqual(Todo.objects.count(), before * 2)
+        copy = Todo.objects.filter(title='Plain').order_by('-id').first()
+        self.assertEqual(copy.description, 'line one\nline, two')
+        self.assertEqual(copy.created_at, datetime(2024, 5, 1, 12, 0, tzinfo=dt_timezone.utc))
+
+    def test_upsert_updates_existing_rows(self):
+        path = f'{self.tmpdir}/todos.ndjson'
+        call_command('export_todos', format='ndjson', output=path)
+        Todo.objects.update(status='cancelled')
+
+        call_command('import_todos', path, upsert=True, stdout=StringIO())
+
+        self.assertEqual(Todo.objects.count(), 2)
+        self.assertEqual(Todo.objects.get(title='Due').status, 'completed')
+        self.assertEqual(Todo.objects.create(title='After').pk, Todo.objects.order_by('-pk').first().pk)
+
+    def test_invalid_row_aborts_import(self):
+        path = f'{self.tmpdir}/bad.ndjson'
+        with open(path, 'w') as f:
+            f.write('{"title": "ok"}\n{"title": "bad", "status": "nope"}\n')
+
+        with self.assertRaisesMessage(CommandError, 'row 2'):
+            call_command('import_todos', path, batch_size=1)
+        self.assertFalse(Todo.objects.filter(title='ok').exists())
+
+    def test_export_view_streams_filtered_csv(self):
+        response = self.client.get(reverse('todo_export'), {'status': 'completed'})
+        body = b''.join(response.streaming_content).decode()
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(body.splitlines()[0], ','.join(todos.FIELDS))
+        self.assertIn('Due', body)
+        self.assertNotIn('Plain', body)
+
+    def test_export_view_streams_asynchronously_under_asgi(self):
+        async def fetch():
+            response = await self.async_client.get(reverse('todo_export'), {'format': 'ndjson'})
+            return response, b''.join([chunk async for chunk in response.streaming_content])
+
+        response, body = async_to_sync(fetch)()
+
+        self.assertTrue(response.is_async)
+        self.assertEqual(len(body.splitlines()), 2)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class TodoSearchTests(TestCase):
+    def setUp(self):
+        self.title_hit = Todo.objects.create(title='Deploy the search index', description='')
+        self.description_hit = Todo.objects.create(title='Ops', description='Check that search works after deploying')
+        Todo.objects.create(title='Unrelated', description='nothing here')
+
+    def titles(self, text):
+        return [todo.title for todo in search.search(Todo.objects.all(), text)]
+
+    def test_ranks_title_matches_first(self):
+        self.assertEqual(self.titles('search'), ['Deploy the search index', 'Ops'])
+        # Stemmed and prefix matches: "deploying" and "deploy"
+        self.assertEqual(self.titles('deplo'), ['Deploy the search index', 'Ops'])
+
+    def test_index_follows_writes(self):
+        Todo.objects.filter(pk=self.title_hit.pk).update(title='Renamed')
+        self.description_hit.delete()
+        Todo.objects.bulk_create([Todo(title='Search docs')])
+
+        self.assertEqual(self.titles('search'), ['Search docs'])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.titles('search" -( ^*'), ['Deploy the search index', 'Ops'])
+        self.assertEqual(self.titles('!!!'), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'FTS5 plan')
+    def test_uses_fts_index(self):
+        plan = search.search(Todo.objects.all(), 'search').explain()
+        self.assertIn('VIRTUAL TABLE INDEX', plan)
+        self.assertNotIn('SCAN core_todo ', plan + ' ')
+
+    def test_list_view_search_pages(self):
+        Todo.objects.bulk_create([Todo(title=f'search result {i}') for i in range(3)])
+
+        first = self.client.get(reverse('todo_list'), {'q': 'search', 'per_page': 3})
+        second = self.client.get(reverse('todo_list'), {'q': 'search', 'per_page': 3, 'page': 2})
+
+        self.assertEqual(first.context['page'].next_cursor, 2)
+        self.assertEqual(len(first.context['todos']) + len(second.context['todos']), 5)
+        self.assertContains(second, '← Better matches')
+
+    def test_export_keeps_the_search(self):
+        response = self.client.get(reverse('todo_export'), {'q': 'search', 'format': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['Deploy the search index', 'Ops'])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_todo_list_revalidates_until_a_row_changes(self):
+        todo = Todo.objects.create(title='First')
+        url = reverse('todo_list')
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        todo.save()
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 200)
+        etag = self.client.get(url)['ETag']
+        todo.delete()
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 200)
+
+    def test_no_last_modified_to_outlive_deletes(self):
+        Todo.objects.create(title='First')
+        url = reverse('todo_list')
+        self.assertFalse(self.client.get(url).has_header('Last-Modified'))
+
+        Todo.objects.create(title='Second').delete()
+        since = {'if-modified-since': 'Fri, 01 Jan 2100 00:00:00 GMT'}
+        self.assertEqual(self.client.get(url, headers=since).status_code, 200)
+
+    def test_leetcode_304_skips_rendering_and_upstream(self):
+        LeetCodeQuestion.store(QUESTION)
+        url = reverse('leetcode_question_detail', args=['two-sum'])
+        first = self.client.get(url)
+        self.assertTrue(first.has_header('ETag'))
+
+        with mock.patch.object(leetcode, 'graphql') as graphql, \
+                mock.patch.object(leetcode_render, 'aquestion_body') as body:
+            response = self.client.get(url, headers={'if-none-match': first['ETag']})
+
+        self.assertEqual(response.status_code, 304)
+        graphql.assert_not_called()
+        body.assert_not_called()
+
+    def test_deploy_changes_etags(self):
+        Todo.objects.create(title='First')
+        LeetCodeQuestion.store(QUESTION)
+        urls = [reverse('todo_list'), reverse('leetcode_question_detail', args=['two-sum'])]
+        with override_settings(RELEASE_VERSION='v1'):
+            etags = [self.client.get(url)['ETag'] for url in urls]
+
+        with override_settings(RELEASE_VERSION='v2'):
+            for url, etag in zip(urls, etags):
+                self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 200)
+
+    def test_release_includes_the_static_manifest(self):
+        with mock.patch.object(conditional.staticfiles_storage, 'manifest_hash', 'abc123', create=True), \
+                override_settings(RELEASE_VERSION='v1'):
+            self.assertEqual(conditional.release(), 'v1-abc123')
+
+    def test_error_pages_have_no_validators(self):
+        with mock.patch.object(leetcode, 'graphql', side_effect=leetcode.LeetCodeError('Network error')):
+            response = self.client.get(reverse('leetcode_daily'))
+        self.assertFalse(response.has_header('ETag'))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.todos = [Todo.objects.create(title=f'Todo {i}') for i in range(3)]
+
+    def test_unchanged_list_is_served_from_cache(self):
+        url = reverse('todo_list')
+        self.client.get(url)
+        # Only the ETag aggregate; no page query and no card rendering
+        with self.assertNumQueries(1), \
+                mock.patch.object(fragments, 'render_to_string') as render:
+            response = self.client.get(url)
+        render.assert_not_called()
+        self.assertContains(response, 'Todo 2')
+        self.assertEqual(fragments.stats()['todo_list'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_save_rerenders_only_the_changed_card(self):
+        url = reverse('todo_list')
+        self.client.get(url)
+        self.todos[0].title = 'Renamed'
+        self.todos[0].save()
+
+        response = self.client.get(url)
+
+        self.assertContains(response, 'Renamed')
+        self.assertEqual(fragments.stats()['todo_card'], {'hits': 2, 'misses': 4, 'hit_rate': 0.333})
+
+    def test_signals_and_bulk_writes_bump_the_version(self):
+        version = fragments.todo_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.todos[0].delete()
+        self.assertEqual(fragments.todo_version(), version + 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            todos.apply_bulk(update=[{'id': self.todos[1].pk, 'status': 'completed'}])
+        self.assertEqual(fragments.todo_version(), version + 2)
+
+    def test_bulk_delete_is_one_query_and_one_bump(self):
+        version = fragments.todo_version()
+        pks = [todo.pk for todo in self.todos]
+        with self.captureOnCommitCallbacks(execute=True), \
+                CaptureQueriesContext(connection) as queries:
+            todos.apply_bulk(delete=pks)
+        deletes = [q['sql'] for q in queries if q['sql'].startswith('DELETE')]
+        selects = [q['sql'] for q in queries if q['sql'].startswith('SELECT')]
+        # One SELECT for the existing ids, no per-row collection before the DELETE
+        self.assertEqual((len(deletes), len(selects)), (1, 1))
+        self.assertEqual(fragments.todo_version(), version + 1)
+
+    def test_templates_are_cached_in_production(self):
+        from django.template import engines
+        loaders = engines['django'].engine.template_loaders
+        self.assertEqual([type(loader).__name__ for loader in loaders], ['Loader'])
+        self.assertEqual(type(loaders[0]).__module__, 'django.template.loaders.cached')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, PROFILING_ENABLED=True)
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_breaks_down_sql_and_template_time(self):
+        Todo.objects.create(title='Profile me')
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            response = self.client.get(reverse('todo_list'))
+
+        timing = response['Server-Timing']
+        self.assertTrue(timing.startswith('total;dur='))
+        self.assertIn('db;dur=', timing)
+        self.assertIn('template;dur=', timing)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'todo_list')
+        self.assertGreaterEqual(line['db_count'], 2)
+        self.assertEqual(line['upstream_count'], 0)
+
+    async def test_counts_upstream_and_decode_in_async_views(self):
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json={'data': {'question': QUESTION}}))
+        client = AsyncLeetCodeClient(max_retries=0)
+        client.client = httpx.AsyncClient(transport=transport)
+
+        with mock.patch.object(leetcode, 'get_async_client', return_value=client), \
+                self.assertLogs('core.profiling', 'INFO') as logs:
+            response = await self.async_client.get(reverse('leetcode_question_detail', args=['two-sum']))
+
+        self.assertContains(response, 'Two Sum')
+        self.assertIn('upstream;dur=', response['Server-Timing'])
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line['upstream_count'], line['decode_count']), (1, 1))
+        self.assertGreaterEqual(line['template_count'], 1)
+
+    def test_dumps_cprofile_for_slow_requests(self):
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                override_settings(PROFILING_DUMP_THRESHOLD_MS=1, PROFILING_DUMP_DIR=tmpdir), \
+                self.assertLogs('core.profiling', 'INFO'):
+            with mock.patch.object(time, 'perf_counter', side_effect=itertools.count(step=1.0).__next__):
+                self.client.get(reverse('health_check'))
+            dumps = os.listdir(tmpdir)
+        self.assertEqual(len(dumps), 1)
+        self.assertIn('-GET-health-', dumps[0])
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled_by_default(self):
+        self.assertFalse(self.client.get(reverse('health_check')).has_header('Server-Timing'))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, METRICS_TOKEN='s3cret')
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.REGISTRY.clear()
+
+    def test_records_requests_and_queries_per_url_name(self):
+        self.client.get(reverse('todo_list'))
+        self.client.get('/no-such-page/')
+
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer s3cret'})
+
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        body = response.content.decode()
+        self.assertIn('# TYPE django_request_duration_seconds histogram', body)
+        self.assertIn('django_request_duration_seconds_count{view="todo_list",method="GET"} 1', body)
+        self.assertIn('django_request_duration_seconds_bucket{view="todo_list",method="GET",le="+Inf"} 1', body)
+        self.assertIn('django_requests_total{view="todo_list",status="200"} 1.0', body)
+        self.assertIn('django_requests_total{view="unmatched",status="404"} 1.0', body)
+        self.assertRegex(body, r'django_db_queries_total\{view="todo_list"\} [1-9]')
+        self.assertIn('leetcode_cache_events_total{query="questionOfToday",event="hits"} 0.0', body)
+        self.assertIn('fragment_cache_events_total{fragment="todo_list",event="misses"} 1.0', body)
+
+    def test_histogram_buckets_are_cumulative(self):
+        for seconds in (0.003, 0.02, 0.02, 30):
+            metrics.REQUEST_LATENCY.observe(seconds, 'home', 'GET')
+
+        body = metrics.render()
+
+        labels = 'view="home",method="GET"'
+        self.assertIn(f'django_request_duration_seconds_bucket{{{labels},le="0.005"}} 1', body)
+        self.assertIn(f'django_request_duration_seconds_bucket{{{labels},le="0.025"}} 3', body)
+        self.assertIn(f'django_request_duration_seconds_bucket{{{labels},le="10.0"}} 3', body)
+        self.assertIn(f'django_request_duration_seconds_bucket{{{labels},le="+Inf"}} 4', body)
+        self.assertIn(f'django_request_duration_seconds_sum{{{labels}}} 30.043', body)
+
+    def test_counts_upstream_latency_and_errors_by_query(self):
+        transport = httpx.MockTransport(lambda request: httpx.Response(503))
+        client = AsyncLeetCodeClient(max_retries=0)
+        client.client = httpx.AsyncClient(transport=transport)
+        async_to_sync(client.post)({'query': '{}'}, 'questionOfToday')
+
+        with mock.patch.object(LeetCodeClient, 'post', return_value=mock.Mock(
+                status_code=200, json=lambda: {'errors': ['bad']})):
+            with self.assertRaises(leetcode.LeetCodeError):
+                leetcode.graphql(leetcode.QUESTION_CONTENT_QUERY, {'titleSlug': 'two-sum'})
+
+        body = metrics.render()
+        self.assertIn('leetcode_graphql_duration_seconds_count{operation="questionOfToday"} 1', body)
+        self.assertIn('leetcode_graphql_errors_total{operation="questionOfToday",reason="http_503"} 1.0', body)
+        self.assertIn('leetcode_graphql_errors_total{operation="questionContent",reason="graphql"} 1.0', body)
+
+    def test_sums_worker_files_in_metrics_dir(self):
+        with tempfile.TemporaryDirectory() as tmpdir, override_settings(METRICS_DIR=tmpdir):
+            other = {'django_requests_total': [[['home', '200'], 5]]}
+            with open(os.path.join(tmpdir, '99999.json'), 'w') as f:
+                json.dump(other, f)
+            metrics.REQUESTS.inc('home', 200, amount=2)
+
+            body = metrics.render()
+
+            self.assertIn(f'{os.getpid()}.json', os.listdir(tmpdir))
+        self.assertIn('django_requests_total{view="home",status="200"} 7.0', body)
+
+    def test_exited_workers_are_folded_into_one_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir, override_settings(METRICS_DIR=tmpdir):
+            # A dead worker, and an earlier process that had this pid
+            for pid, count in [(99999, 5), (os.getpid(), 3)]:
+                with open(os.path.join(tmpdir, f'{pid}.json'), 'w') as f:
+                    json.dump({'django_requests_total': [[['home', '200'], count]]}, f)
+            metrics.REQUESTS.inc('home', 200, amount=2)
+
+            first = metrics.render()
+            second = metrics.render()
+
+            self.assertEqual(sorted(os.listdir(tmpdir)), sorted(['.lock', 'exited.json', f'{os.getpid()}.json']))
+        self.assertIn('django_requests_total{view="home",status="200"} 10.0', first)
+        self.assertIn('django_requests_total{view="home",status="200"} 10.0', second)
+
+    def test_token_required(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer s3cret'})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_hidden_without_a_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+
+class BenchDbConnectionsCommandTests(TestCase):
+    @skipUnless(connection.vendor != 'postgresql', 'refuses non-PostgreSQL databases only')
+    def test_requires_postgresql(self):
+        with self.assertRaisesMessage(CommandError, 'PostgreSQL'):
+            call_command('bench_db_connections', stdout=StringIO())
+
+
+class GunicornConfigTests(TestCase):
+    def setUp(self):
+        # The config exports WEB_CONCURRENCY; keep that out of this process
+        with mock.patch.dict(os.environ):
+            self.config = runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))
+
+    def test_tunes_for_the_deployed_container(self):
+        # amvera.yaml: 500m CPU, 512Mi
+        asgi = self.config['tune']('asgi', 0.5, 512)
+        sync = self.config['tune']('sync', 0.5, 512)
+        self.assertEqual((asgi['workers'], asgi['threads']), (2, 1))
+        self.assertEqual((sync['workers'], sync['threads']), (2, 4))
+        self.assertEqual(asgi['max_requests_jitter'], asgi['max_requests'] // 10)
+
+    def test_memory_caps_workers(self):
+        self.assertEqual(self.config['tune']('sync', 8, 512)['workers'], 3)
+        self.assertEqual(self.config['tune']('sync', 8, 64 * 1024)['workers'], 17)
+        self.assertEqual(self.config['tune']('asgi', 1, 100)['workers'], 1)
+
+
+class ImportTimeTests(TestCase):
+    def test_parses_importtime_tree(self):
+        stderr = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       100 |        100 |     urllib3\n'
+            'import time:       200 |        300 |   requests\n'
+            'import time:        50 |        350 | core.leetcode\n'
+        )
+        imports = importtime.parse_importtime(stderr)
+        self.assertEqual([(i.name, i.parent) for i in imports], [
+            ('urllib3', 'requests'), ('requests', 'core.leetcode'), ('core.leetcode', None),
+        ])
+        self.assertEqual(imports[1].cumulative_us, 300)
+
+    def test_public_profile_serves_without_auth_apps(self):
+        out = StringIO()
+        call_command('importtime', '--settings-module', 'config.settings_public', '--runs', '1', stdout=out)
+        self.assertIn('first request to /health/', out.getvalue())
+        self.assertIn('(status 200)', out.getvalue())
+        self.assertNotIn('django.contrib.auth', out.getvalue())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class DebugInfoTests(TestCase):
+    def test_reports_versions(self):
+        response = self.client.get(reverse('debug_info'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['django_version'], django.get_version())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class TodoActionQueryTests(TestCase):
+    def test_write_actions_skip_the_session_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('todo_create'), {'title': 'Ship it', 'priority': 'high', 'status': 'pending'})
+            page = self.client.get(response['Location'])
+
+        self.assertContains(page, 'Ship it')
+        self.assertIn('messages', response.cookies)
+        self.assertFalse([q['sql'] for q in queries if 'django_session' in q['sql']])
+
+    def test_benchmark_reports_every_mode(self):
+        out = StringIO()
+        call_command('bench_todo_actions', '--rounds', '1', stdout=out)
+        self.assertIn('session messages, db sessions: create', out.getvalue())
+        self.assertFalse(Todo.objects.exists())
@@ -0,0 +1,136 @@
+"""
+CSV/NDJSON export and import of todos.
+
+Exports read the table with values_list().iterator() and yield text one
+chunk of rows at a time, so memory does not depend on the table size.
+Imports read the file lazily and insert it with bulk_create in batches.
+"""
+
+import csv
+import json
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import fragments, todos
+from .models import Todo
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+
+class TodoImportError(ValueError):
+    """A row in an import file is invalid; `line` is its 1-based position"""
+
+    def __init__(self, line, errors):
+        self.line = line
+        self.errors = errors
+        super().__init__(f'row {line}: {errors}')
+
+
+class _Line:
+    """File-like object that hands back what csv.writer writes to it"""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(queryset, fmt, chunk_size=2000):
+    """Yield the queryset as CSV or NDJSON text, one chunk of rows per piece"""
+    rows = queryset.order_by('id').values_list(*todos.FIELDS).iterator(chunk_size=chunk_size)
+    if fmt == 'csv':
+        writer = csv.writer(_Line())
+        yield writer.writerow(todos.FIELDS)
+        encode = writer.writerow
+    elif fmt == 'ndjson':
+        def encode(row):
+            return encoder.encode(dict(zip(todos.FIELDS, row))) + '\n'
+    else:
+        raise ValueError(f'unknown format {fmt!r}')
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        yield ''.join(encode(row) for row in chunk)
+
+
+def read_rows(file, fmt):
+    """Iterate the rows of an exported file as dicts"""
+    if fmt == 'csv':
+        yield from csv.DictReader(file)
+    elif fmt == 'ndjson':
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f'unknown format {fmt!r}')
+
+
+def build_todo(row, keep_id):
+    """Validate one imported row and return an unsaved Todo"""
+    fields, errors = todos.clean_todo(row)
+    for name in ('created_at', 'updated_at'):
+        try:
+            fields[name] = todos.parse_timestamp(row.get(name))
+        except ValueError as e:
+            errors[name] = str(e)
+    if keep_id and row.get('id') not in (None, ''):
+        try:
+            fields['id'] = int(row['id'])
+        except (TypeError, ValueError):
+            errors['id'] = 'must be an integer'
+    if errors:
+        raise ValueError(errors)
+    return Todo(**fields)
+
+
+def import_rows(rows, batch_size=1000, upsert=False):
+    """Insert rows in bulk_create batches inside one transaction.
+
+    With upsert=True ids from the file are kept and rows whose id already
+    exists are updated in place; otherwise every row becomes a new todo.
+    Returns the number of rows written.
+    """
+    update_fields = [field for field in todos.FIELDS if field != 'id']
+    options = {'update_conflicts': True, 'unique_fields': ['id'], 'update_fields': update_fields} if upsert else {}
+    written = 0
+    line = 0
+    with transaction.atomic():
+        rows = iter(rows)
+        while True:
+            batch = []
+            for row in islice(rows, batch_size):
+                line += 1
+                try:
+                    todo = build_todo(row, keep_id=upsert)
+                except ValueError as e:
+                    raise TodoImportError(line, e.args[0]) from None
+                todo.created_at = todo.created_at or timezone.now()
+                todo.updated_at = todo.updated_at or todo.created_at
+                batch.append(todo)
+            if not batch:
+                break
+            stamps = [(todo.created_at, todo.updated_at) for todo in batch]
+            Todo.objects.bulk_create(batch, batch_size=batch_size, **options)
+            # auto_now/auto_now_add replaced the file's timestamps on insert
+            for todo, (created_at, updated_at) in zip(batch, stamps):
+                todo.created_at, todo.updated_at = created_at, updated_at
+            Todo.objects.bulk_update(batch, ['created_at', 'updated_at'], batch_size=batch_size)
+            written += len(batch)
+
+        # bulk_create() sends no post_save signals
+        transaction.on_commit(fragments.bump_todo_version)
+        if upsert:
+            # Explicit ids do not advance PostgreSQL's sequence; reset it like loaddata does
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [Todo]):
+                    cursor.execute(sql)
+    return written
@@ -0,0 +1,205 @@
+"""
+Todo filtering, validation and batched writes shared by the list page and
+the JSON endpoints.
+
+In a bulk batch each operation in a batch is validated on its own and reported back by
+position; the valid ones are applied with one bulk_create, one update()
+per distinct change and one delete(), all inside a single transaction.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import fragments
+from .models import Todo
+
+TITLE_MAX_LENGTH = Todo._meta.get_field('title').max_length
+UPDATABLE_FIELDS = ('status', 'priority')
+# Columns exposed by the list page and the JSON API
+FIELDS = ('id', 'title', 'description', 'priority', 'status', 'due_date', 'created_at', 'updated_at')
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d') if value else None
+    except ValueError:
+        return None
+
+
+def filter_todos(queryset, params):
+    """Apply the status/priority/due-date filters from a GET querydict.
+
+    Returns (queryset, filters) where filters holds the values that were
+    valid and applied, for re-populating the filter form.
+    """
+    filters = {}
+    status = params.get('status', '')
+    if status == 'open':
+        queryset = queryset.filter(status__in=Todo.OPEN_STATUSES)
+        filters['status'] = status
+    elif status in dict(Todo.STATUS_CHOICES):
+        queryset = queryset.filter(status=status)
+        filters['status'] = status
+    priority = params.get('priority', '')
+    if priority in dict(Todo.PRIORITY_CHOICES):
+        queryset = queryset.filter(priority=priority)
+        filters['priority'] = priority
+    # Compare against datetime bounds rather than due_date__date so an index
+    # on due_date can be used
+    due_from = _parse_date(params.get('due_from'))
+    if due_from:
+        queryset = queryset.filter(due_date__gte=timezone.make_aware(due_from))
+        filters['due_from'] = due_from.date().isoformat()
+    due_to = _parse_date(params.get('due_to'))
+    if due_to:
+        queryset = queryset.filter(due_date__lt=timezone.make_aware(due_to + timedelta(days=1)))
+        filters['due_to'] = due_to.date().isoformat()
+    return queryset, filters
+
+
+class BulkError(ValueError):
+    """The batch as a whole is malformed (as opposed to one bad item)"""
+
+
+def _choice(data, field, choices, errors, default=None):
+    value = data.get(field, default)
+    if value not in dict(choices):
+        errors[field] = f'must be one of {", ".join(dict(choices))}'
+    return value
+
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 datetime; naive values are in the current time zone"""
+    if value in (None, ''):
+        return None
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise ValueError('must be an ISO 8601 datetime')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def clean_todo(data):
+    """Validate a dict of todo fields; returns (fields, errors)"""
+    if not isinstance(data, dict):
+        return {}, {'__all__': 'must be an object'}
+    errors = {}
+    title = data.get('title')
+    if not isinstance(title, str) or not title.strip():
+        errors['title'] = 'is required'
+    elif len(title) > TITLE_MAX_LENGTH:
+        errors['title'] = f'must be at most {TITLE_MAX_LENGTH} characters'
+    fields = {
+        'title': title,
+        'description': data.get('description') or '',
+        'priority': _choice(data, 'priority', Todo.PRIORITY_CHOICES, errors, 'medium'),
+        'status': _choice(data, 'status', Todo.STATUS_CHOICES, errors, 'pending'),
+    }
+    try:
+        fields['due_date'] = parse_timestamp(data.get('due_date'))
+    except ValueError as e:
+        errors['due_date'] = str(e)
+    return fields, errors
+
+
+def clean_changes(data):
+    """Validate a status/priority update; returns (pk, changes, errors)"""
+    if not isinstance(data, dict):
+        return None, {}, {'__all__': 'must be an object'}
+    errors = {}
+    pk = data.get('id')
+    if not isinstance(pk, int) or isinstance(pk, bool):
+        errors['id'] = 'must be an integer'
+    changes = {}
+    for field, choices in (('status', Todo.STATUS_CHOICES), ('priority', Todo.PRIORITY_CHOICES)):
+        if field in data:
+            changes[field] = _choice(data, field, choices, errors)
+    if not changes and not errors:
+        errors['__all__'] = f'nothing to update (expected {" or ".join(UPDATABLE_FIELDS)})'
+    return pk, changes, errors
+
+
+def apply_bulk(create=(), update=(), delete=(), max_items=None):
+    """Apply a batch of creates, updates and deletes in one transaction.
+
+    Returns {'created': [...], 'updated': [...], 'deleted': [...]} with one
+    result per input item, in input order.
+    """
+    if not all(isinstance(ops, (list, tuple)) for ops in (create, update, delete)):
+        raise BulkError('create, update and delete must be lists')
+    if max_items is not None and len(create) + len(update) + len(delete) > max_items:
+        raise BulkError(f'at most {max_items} operations per request')
+
+    with transaction.atomic():
+        results = {
+            'created': _bulk_create(create),
+            'updated': _bulk_update(update),
+            'deleted': _bulk_delete(delete),
+        }
+        # bulk_create() and update() send no post_save signals
+        transaction.on_commit(fragments.bump_todo_version)
+    return results
+
+
+def _bulk_create(items):
+    results = [None] * len(items)
+    pending = []
+    for index, item in enumerate(items):
+        fields, errors = clean_todo(item)
+        if errors:
+            results[index] = {'ok': False, 'errors': errors}
+        else:
+            pending.append((index, Todo(**fields)))
+
+    created = Todo.objects.bulk_create([todo for _, todo in pending])
+    for (index, _), todo in zip(pending, created):
+        results[index] = {'ok': True, 'id': todo.pk}
+    return results
+
+
+def _bulk_update(items):
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        pk, changes, errors = clean_changes(item)
+        if errors:
+            results[index] = {'ok': False, 'id': pk, 'errors': errors}
+        else:
+            valid.append((index, pk, changes))
+
+    existing = set(Todo.objects.filter(pk__in=[pk for _, pk, _ in valid]).values_list('pk', flat=True))
+    # One UPDATE per distinct set of changes rather than one per row
+    groups = defaultdict(list)
+    for index, pk, changes in valid:
+        if pk in existing:
+            groups[tuple(sorted(changes.items()))].append(pk)
+            results[index] = {'ok': True, 'id': pk}
+        else:
+            results[index] = {'ok': False, 'id': pk, 'errors': {'id': 'not found'}}
+
+    # update() skips auto_now, so set updated_at explicitly
+    now = timezone.now()
+    for changes, pks in groups.items():
+        Todo.objects.filter(pk__in=pks).update(updated_at=now, **dict(changes))
+    return results
+
+
+def _bulk_delete(pks):
+    valid = [pk for pk in pks if isinstance(pk, int) and not isinstance(pk, bool)]
+    existing = set(Todo.objects.filter(pk__in=valid).values_list('pk', flat=True))
+    if existing:
+        Todo.objects.filter(pk__in=existing).delete()
+    results = []
+    for pk in pks:
+        if not isinstance(pk, int) or isinstance(pk, bool):
+            results.append({'ok': False, 'id': pk, 'errors': {'id': 'must be an integer'}})
+        elif pk in existing:
+            results.append({'ok': True, 'id': pk})
+        else:
+            results.append({'ok': False, 'id': pk, 'errors': {'id': 'not found'}})
+    return results
@@ -1,15 +1,20 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.home, name='home'),
     path('health/', views.health_check, name='health_check'),
     path('debug/', views.debug_info, name='debug_info'),
+    path('metrics/', views.metrics_view, name='metrics'),
     path('leetcode-daily/', views.leetcode_daily, name='leetcode_daily'),
     path('leetcode-recent/', views.leetcode_recent, name='leetcode_recent'),
     path('leetcode-question/<str:question_slug>/', views.leetcode_question_detail, name='leetcode_question_detail'),
     path('todos/', views.todo_list, name='todo_list'),
     path('todos/create/', views.todo_create, name='todo_create'),
+    path('todos/bulk/', views.todo_bulk, name='todo_bulk'),
+    path('todos/export/', views.todo_export, name='todo_export'),
     path('todos/<int:pk>/update/', views.todo_update, name='todo_update'),
     path('todos/<int:pk>/delete/', views.todo_delete, name='todo_delete'),
+    path('api/todos/', api.todo_collection, name='api_todo_collection'),
+    path('api/todos/<int:pk>/', api.todo_item, name='api_todo_item'),
 ]
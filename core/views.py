@@ -1,11 +1,23 @@
+import django
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.utils import timezone
-from django.http import JsonResponse
-import requests
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import require_POST
+import functools
+import hmac
 import json
-from datetime import datetime, timedelta
+import os
+import sys
+from datetime import datetime
+from . import api, conditional, fragments, leetcode, metrics, leetcode_render, rate_limit, search, todo_io, todos
 from .models import Todo
+from .pagination import keyset_page, offset_page
 
 def home(request):
     try:
@@ -20,368 +32,206 @@ def health_check(request):
 
 def debug_info(request):
     """Debug endpoint to help troubleshoot Railway deployment"""
-    import os
-    import sys
-    from django.conf import settings
-    
     debug_info = {
         'status': 'ok',
-        'django_version': settings.VERSION,
+        'django_version': django.get_version(),
         'python_version': sys.version,
         'port': os.environ.get('PORT', 'not set'),
         'debug': settings.DEBUG,
         'allowed_hosts': settings.ALLOWED_HOSTS,
         'database_engine': settings.DATABASES['default']['ENGINE'],
         'static_url': settings.STATIC_URL,
-        'static_root': getattr(settings, 'STATIC_ROOT', 'not set'),
+        'static_root': str(getattr(settings, 'STATIC_ROOT', 'not set')),
+        'cache_backend': settings.CACHES['default']['BACKEND'],
+        'leetcode_cache': leetcode.cache_stats(),
+        'leetcode_client': leetcode.client_metrics(),
+        'leetcode_circuit': leetcode.breaker_state(),
+        'fragment_cache': fragments.stats(),
     }
     return JsonResponse(debug_info)
 
-def leetcode_daily(request):
+def metrics_view(request):
+    """Prometheus scrape endpoint (see core.metrics); 404 until METRICS_TOKEN is set"""
+    if not settings.METRICS_ENABLED or not settings.METRICS_TOKEN:
+        raise Http404
+    expected = f'Bearer {settings.METRICS_TOKEN}'
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+        return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+def _render_validated(request, template, context, etag):
+    """Render, adding the ETag when the page shows real data"""
+    response = render(request, template, context)
+    if etag and not context.get('error'):
+        conditional.set_etag(response, etag)
+    return response
+
+async def _leetcode(request, name, *args, **kwargs):
+    """Call leetcode.<name>, or its async version a<name> under ASGI.
+
+    Under WSGI every request runs its async view on an event loop of its
+    own, where the async path would need a new httpx client (and TLS
+    handshake) per request and could not coalesce fetches with other
+    requests; the sync path runs in the request's thread with the pooled
+    requests client instead.
+    """
+    if isinstance(request, ASGIRequest):
+        return await getattr(leetcode, f'a{name}')(*args, **kwargs)
+    return await sync_to_async(getattr(leetcode, name))(*args, **kwargs)
+
+async def leetcode_daily(request):
+    etag = None
     try:
-        # LeetCode GraphQL endpoint
-        url = "https://leetcode.com/graphql/"
-        
-        # GraphQL query to get the daily question
-        query = """
-        query questionOfToday {
-            activeDailyCodingChallengeQuestion {
-                date
-                userStatus
-                link
-                question {
-                    acRate
-                    difficulty
-                    freqBar
-                    frontendQuestionId: questionFrontendId
-                    isFavor
-                    paidOnly: isPaidOnly
-                    status
-                    title
-                    titleSlug
-                    hasVideoSolution
-                    hasSolution
-                    topicTags {
-                        name
-                        id
-                        slug
-                    }
-                    content
-                    exampleTestcases
-                    hints
-                    metaData
-                }
+        result = await _leetcode(request, 'get_daily_challenge')
+        daily_question = result.value
+
+        if daily_question:
+            etag = conditional.leetcode_etag(result)
+            if response := conditional.not_modified(request, etag):
+                return response
+            question = daily_question.get('question') or {}
+            context = {
+                'question': question,
+                'content': await leetcode_render.aquestion_content(question),
+                'date': daily_question.get('date', ''),
+                'link': daily_question.get('link', ''),
+                'user_status': daily_question.get('userStatus', ''),
+                'stale': result.stale,
+                'fetched_at': result.fetched_at,
+                'error': None
             }
-        }
-        """
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.post(url, json={'query': query}, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            daily_question = data.get('data', {}).get('activeDailyCodingChallengeQuestion', {})
-            
-            if daily_question:
-                context = {
-                    'question': daily_question.get('question', {}),
-                    'date': daily_question.get('date', ''),
-                    'link': daily_question.get('link', ''),
-                    'user_status': daily_question.get('userStatus', ''),
-                    'error': None
-                }
-            else:
-                context = {'error': 'No daily question found'}
         else:
-            context = {'error': f'Failed to fetch data: {response.status_code}'}
-            
-    except requests.RequestException as e:
-        context = {'error': f'Network error: {str(e)}'}
+            context = {'error': 'No daily question found'}
+
+    except leetcode.LeetCodeError as e:
+        context = {'error': str(e)}
     except Exception as e:
         context = {'error': f'Unexpected error: {str(e)}'}
-    
-    return render(request, 'core/leetcode_daily.html', context)
 
-def leetcode_recent(request):
+    return _render_validated(request, 'core/leetcode_daily.html', context, etag)
+
+async def leetcode_recent(request):
+    etag = None
     try:
-        # LeetCode GraphQL endpoint
-        url = "https://leetcode.com/graphql/"
-        
         # Get current year and month
-        from datetime import datetime
-        current_date = datetime.now()
-        current_year = current_date.year
-        current_month = current_date.month
-        
-        # GraphQL query to get recent daily questions with required year and month parameters
-        query = """
-        query recentDailyQuestions($year: Int!, $month: Int!) {
-            dailyCodingChallengeV2(year: $year, month: $month) {
-                challenges {
-                    date
-                    userStatus
-                    link
-                    question {
-                        acRate
-                        difficulty
-                        freqBar
-                        frontendQuestionId: questionFrontendId
-                        isFavor
-                        paidOnly: isPaidOnly
-                        status
-                        title
-                        titleSlug
-                        hasVideoSolution
-                        hasSolution
-                        topicTags {
-                            name
-                            id
-                            slug
-                        }
-                        content
-                        exampleTestcases
-                        hints
-                        metaData
-                    }
-                }
+        current_date = timezone.now()
+
+        result = await _leetcode(request, 'get_month_challenges', current_date.year, current_date.month)
+        challenges = result.value
+
+        if challenges:
+            # Get the last 5 questions (most recent first)
+            recent_questions = challenges[:5]
+            etag = conditional.leetcode_etag(result._replace(value=recent_questions))
+            if response := conditional.not_modified(request, etag):
+                return response
+
+            context = {
+                'questions': recent_questions,
+                'stale': result.stale,
+                'fetched_at': result.fetched_at,
+                'error': None
             }
-        }
-        """
-        
-        variables = {
-            "year": current_year,
-            "month": current_month
-        }
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.post(url, json={'query': query, 'variables': variables}, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            # Debug: Print the response structure
-            print("API Response:", data)
-            
-            # Check if we have data and errors
-            if 'errors' in data:
-                context = {'error': f'API Error: {data["errors"]}'}
-            elif 'data' in data and data['data']:
-                # Try to get challenges from the response
-                challenges = None
-                if 'dailyCodingChallengeV2' in data['data'] and data['data']['dailyCodingChallengeV2']:
-                    challenges = data['data']['dailyCodingChallengeV2'].get('challenges', [])
-                
-                if challenges and len(challenges) > 0:
-                    # Get the last 5 questions (most recent first)
-                    recent_questions = challenges[:5]
-                    
-                    context = {
-                        'questions': recent_questions,
-                        'error': None
-                    }
-                else:
-                    # Fallback: Create mock data for demonstration
-                    context = {
-                        'questions': [
-                            {
-                                'date': '2025-09-05',
-                                'link': '/problems/sample-problem-1',
-                                'question': {
-                                    'title': 'Sample Problem 1',
-                                    'difficulty': 'Easy',
-                                    'acRate': 75.5,
-                                    'frontendQuestionId': '1',
-                                    'paidOnly': False,
-                                    'topicTags': [{'name': 'Array'}, {'name': 'Hash Table'}]
-                                }
-                            },
-                            {
-                                'date': '2025-09-04',
-                                'link': '/problems/sample-problem-2',
-                                'question': {
-                                    'title': 'Sample Problem 2',
-                                    'difficulty': 'Medium',
-                                    'acRate': 45.2,
-                                    'frontendQuestionId': '2',
-                                    'paidOnly': False,
-                                    'topicTags': [{'name': 'Dynamic Programming'}, {'name': 'String'}]
-                                }
-                            },
-                            {
-                                'date': '2025-09-03',
-                                'link': '/problems/sample-problem-3',
-                                'question': {
-                                    'title': 'Sample Problem 3',
-                                    'difficulty': 'Hard',
-                                    'acRate': 25.8,
-                                    'frontendQuestionId': '3',
-                                    'paidOnly': True,
-                                    'topicTags': [{'name': 'Graph'}, {'name': 'BFS'}]
-                                }
-                            },
-                            {
-                                'date': '2025-09-02',
-                                'link': '/problems/sample-problem-4',
-                                'question': {
-                                    'title': 'Sample Problem 4',
-                                    'difficulty': 'Easy',
-                                    'acRate': 82.1,
-                                    'frontendQuestionId': '4',
-                                    'paidOnly': False,
-                                    'topicTags': [{'name': 'Math'}, {'name': 'Simulation'}]
-                                }
-                            },
-                            {
-                                'date': '2025-09-01',
-                                'link': '/problems/sample-problem-5',
-                                'question': {
-                                    'title': 'Sample Problem 5',
-                                    'difficulty': 'Medium',
-                                    'acRate': 38.7,
-                                    'frontendQuestionId': '5',
-                                    'paidOnly': False,
-                                    'topicTags': [{'name': 'Tree'}, {'name': 'DFS'}]
-                                }
-                            }
-                        ],
-                        'error': 'Using sample data - API endpoint may have changed'
-                    }
-            else:
-                context = {'error': 'No data received from API'}
         else:
-            context = {'error': f'Failed to fetch data: {response.status_code}'}
-            
-    except requests.RequestException as e:
-        context = {'error': f'Network error: {str(e)}'}
+            context = {'error': 'No recent questions found'}
+
+    except leetcode.LeetCodeError as e:
+        context = {'error': str(e)}
     except Exception as e:
         context = {'error': f'Unexpected error: {str(e)}'}
-    
-    return render(request, 'core/leetcode_recent.html', context)
 
-def leetcode_question_detail(request, question_slug):
+    return _render_validated(request, 'core/leetcode_recent.html', context, etag)
+
+async def leetcode_question_detail(request, question_slug):
+    # Unknown slugs cost an upstream call each; keep one client from spending
+    # the budget. Only requests that would call the API are counted.
+    limit = functools.partial(
+        rate_limit.limit_ip, request, 'leetcode_detail',
+        settings.LEETCODE_DETAIL_IP_RATE, settings.LEETCODE_DETAIL_IP_BURST,
+    )
+    etag = None
     try:
-        # LeetCode GraphQL endpoint
-        url = "https://leetcode.com/graphql/"
-        
-        # GraphQL query to get specific question details
-        query = """
-        query questionContent($titleSlug: String!) {
-            question(titleSlug: $titleSlug) {
-                questionId
-                questionFrontendId
-                title
-                titleSlug
-                content
-                difficulty
-                likes
-                dislikes
-                isLiked
-                similarQuestions
-                contributors {
-                    username
-                    profileUrl
-                    avatarUrl
-                    __typename
-                }
-                topicTags {
-                    name
-                    slug
-                    translatedName
-                    __typename
-                }
-                companyTagStats
-                codeSnippets {
-                    lang
-                    langSlug
-                    code
-                    __typename
-                }
-                stats
-                hints
-                solution {
-                    id
-                    canSeeDetail
-                    paidOnly
-                    hasVideoSolution
-                    paidOnlyVideo
-                    __typename
-                }
-                status
-                sampleTestCase
-                metaData
-                judgerAvailable
-                judgeType
-                mysqlSchemas
-                enableRunCode
-                enableTestMode
-                enableDebugger
-                envInfo
-                libraryUrl
-                questionDetailUrl
-                __typename
+        result = await _leetcode(request, 'get_question', question_slug, before_fetch=limit)
+        question = result.value
+
+        if question:
+            etag = conditional.leetcode_etag(result)
+            if response := conditional.not_modified(request, etag):
+                return response
+            context = {
+                'question': question,
+                'body': await leetcode_render.aquestion_body(question),
+                'stale': result.stale,
+                'fetched_at': result.fetched_at,
+                'error': None
             }
-        }
-        """
-        
-        variables = {
-            "titleSlug": question_slug
-        }
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.post(url, json={'query': query, 'variables': variables}, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            if 'errors' in data:
-                context = {'error': f'API Error: {data["errors"]}'}
-            elif 'data' in data and data['data'] and data['data']['question']:
-                question = data['data']['question']
-                
-                # Parse stats if available
-                stats = {}
-                if question.get('stats'):
-                    import json
-                    try:
-                        stats = json.loads(question['stats'])
-                    except:
-                        stats = {}
-                
-                context = {
-                    'question': question,
-                    'stats': stats,
-                    'error': None
-                }
-            else:
-                context = {'error': 'Question not found'}
         else:
-            context = {'error': f'Failed to fetch data: {response.status_code}'}
-            
-    except requests.RequestException as e:
-        context = {'error': f'Network error: {str(e)}'}
+            context = {'error': 'Question not found'}
+
+    except rate_limit.RateLimited as e:
+        return e.response()
+    except leetcode.LeetCodeError as e:
+        context = {'error': str(e)}
     except Exception as e:
         context = {'error': f'Unexpected error: {str(e)}'}
-    
-    return render(request, 'core/leetcode_question_detail.html', context)
+
+    return _render_validated(request, 'core/leetcode_question_detail.html', context, etag)
 
 def todo_list(request):
-    todos = Todo.objects.all()
+    etag = conditional.todo_etag(request)
+    if etag and (response := conditional.not_modified(request, etag)):
+        return response
+    queryset, filters = todos.filter_todos(Todo.objects.only(*todos.FIELDS), request.GET)
+    try:
+        size = min(max(int(request.GET.get('per_page', settings.TODO_PAGE_SIZE)), 1), settings.TODO_MAX_PAGE_SIZE)
+    except ValueError:
+        size = settings.TODO_PAGE_SIZE
+    query = request.GET.get('q', '').strip()
+    if query:
+        filters['q'] = query
+
+    def render_results():
+        if query:
+            page = offset_page(search.search(queryset, query), size, request.GET.get('page'))
+        else:
+            page = keyset_page(queryset, size, after=request.GET.get('after'), before=request.GET.get('before'))
+        results_context = {
+            'todos': page.items,
+            'cards': fragments.todo_cards(page.items),
+            'page': page,
+            'filters': filters,
+        }
+        return render_to_string('core/todo_results.html', results_context, request)
+
+    if etag:
+        # The ETag covers rows changed without signals; the version covers the rest
+        results = fragments.cached('todo_list', [fragments.todo_version(), etag, request.get_full_path()], render_results)
+    else:
+        results = mark_safe(render_results())
     context = {
-        'todos': todos,
+        'results': results,
+        'filters': filters,
+        'status_choices': Todo.STATUS_CHOICES,
+        'priority_choices': Todo.PRIORITY_CHOICES,
     }
-    return render(request, 'core/todo_list.html', context)
+    response = render(request, 'core/todo_list.html', context)
+    if etag:
+        conditional.set_etag(response, etag)
+    return response
+
+def todo_export(request):
+    """Download the (filtered) todo list as CSV or NDJSON"""
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in todo_io.CONTENT_TYPES:
+        return JsonResponse({'error': f'format must be one of {", ".join(todo_io.CONTENT_TYPES)}'}, status=400)
+    queryset, _ = todos.filter_todos(Todo.objects.all(), request.GET)
+    query = request.GET.get('q', '').strip()
+    if query:
+        # Same rows as the search page the link is on, in export (id) order
+        queryset = search.search(queryset, query)
+    response = api.streaming_response(request, todo_io.export_lines(queryset, fmt), todo_io.CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="todos.{fmt}"'
+    return response
 
 def todo_create(request):
     if request.method == 'POST':
@@ -450,3 +300,25 @@ def todo_delete(request, pk):
         'todo': todo,
     }
     return render(request, 'core/todo_confirm_delete.html', context)
+
+@require_POST
+@api.token_or_csrf
+def todo_bulk(request):
+    """Apply a JSON batch of creates, status/priority updates and deletes.
+
+    Body: {"create": [{...}], "update": [{"id": 1, "status": "completed"}], "delete": [2, 3]}
+    """
+    try:
+        payload = json.loads(request.body)
+        if not isinstance(payload, dict):
+            raise todos.BulkError('body must be a JSON object')
+        results = todos.apply_bulk(
+            create=payload.get('create', []),
+            update=payload.get('update', []),
+            delete=payload.get('delete', []),
+            max_items=settings.TODO_BULK_MAX_ITEMS,
+        )
+    except ValueError as e:
+        # json.JSONDecodeError and BulkError are both ValueErrors
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(results)
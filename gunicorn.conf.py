@@ -0,0 +1,156 @@
+"""
+Gunicorn settings, tuned from the CPU and memory the container actually gets.
+
+    gunicorn -c gunicorn.conf.py
+
+SERVER_PROFILE picks how requests are served:
+  sync - gthread workers running config.wsgi (default). Todo pages are
+         short DB-bound requests; a few threads per worker overlap their
+         queries.
+  asgi - uvicorn workers running config.asgi. The LeetCode views are async
+         and wait on leetcode.com without holding a thread, but every sync
+         view (all the todo pages) runs on the worker's one thread-sensitive
+         thread, so DB-bound pages are serialized per worker.
+On the deployed container size loadtest_server measured (32 clients, 200ms
+upstream) todo_list at 107 req/s, p50 203ms under sync vs 89 req/s, p50
+408ms under asgi, and upstream-bound question pages about even (32 vs
+35 req/s): at this worker count asgi's cheaper waiting on leetcode.com
+does not make up for serializing the sync views.
+
+Every derived number can be overridden through the environment:
+WEB_CONCURRENCY, GUNICORN_THREADS, GUNICORN_KEEPALIVE, GUNICORN_MAX_REQUESTS,
+GUNICORN_TIMEOUT and GUNICORN_PRELOAD. WEB_CONCURRENCY is exported so
+config.settings sizes each worker's database pool for the same worker count.
+`python manage.py loadtest_server` runs the app under this file to check
+the numbers.
+"""
+
+import math
+import os
+
+PROFILES = ('asgi', 'sync')
+
+# Resident memory of one worker, with room to grow: loadtest_server measured
+# 65-85MB after warm-up. Keeps all workers inside the memory limit.
+WORKER_MEMORY_MB = int(os.environ.get('GUNICORN_WORKER_MEMORY_MB', 110))
+# Share of the memory limit workers may use (the rest: master, page cache,
+# spikes while a worker renders a large page)
+MEMORY_HEADROOM = 0.75
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def available_cpus():
+    """CPUs this container may use: the cgroup quota if set, else the affinity mask"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    quota = _read('/sys/fs/cgroup/cpu.max')  # cgroup v2: "<quota> <period>" or "max <period>"
+    if quota and not quota.startswith('max'):
+        limit, period = quota.split()
+        return min(cpus, int(limit) / int(period))
+    limit, period = _read('/sys/fs/cgroup/cpu/cpu.cfs_quota_us'), _read('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if limit and period and int(limit) > 0:
+        return min(cpus, int(limit) / int(period))
+    return cpus
+
+
+def available_memory_mb():
+    """Memory limit of this container (cgroup v2/v1), else total RAM"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        limit = _read(path)
+        # v1 reports "no limit" as a huge number
+        if limit and limit != 'max' and int(limit) < 1 << 50:
+            return int(limit) // (1024 * 1024)
+    meminfo = _read('/proc/meminfo') or ''
+    for line in meminfo.splitlines():
+        if line.startswith('MemTotal:'):
+            return int(line.split()[1]) // 1024
+    return 1024
+
+
+def tune(profile, cpus, memory_mb):
+    """Worker settings for a profile on a machine with `cpus` and `memory_mb`"""
+    by_memory = max(int(memory_mb * MEMORY_HEADROOM // WORKER_MEMORY_MB), 1)
+    if profile == 'asgi':
+        # One event loop per core saturates it; at least two so recycling a
+        # worker (max_requests) never leaves the instance without one
+        by_cpu = max(math.ceil(cpus), 2)
+        threads = 1
+    else:
+        # The classic 2n+1, counted in (possibly fractional) cores; threads
+        # cover the time each request waits on PostgreSQL
+        by_cpu = int(2 * cpus) + 1
+        threads = 4
+    workers = max(min(by_cpu, by_memory), 1)
+    per_worker_mb = memory_mb * MEMORY_HEADROOM / workers
+    # Recycle workers sooner when there is little room for them to grow
+    max_requests = min(max(int(per_worker_mb * 10), 500), 5000)
+    return {
+        'workers': workers,
+        'threads': threads,
+        # Async workers hold idle keep-alive connections for free; a
+        # gthread worker ties up a thread per idle connection
+        'keepalive': 20 if profile == 'asgi' else 3,
+        'max_requests': max_requests,
+        'max_requests_jitter': max_requests // 10,
+    }
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name) or default)
+
+
+profile = os.environ.get('SERVER_PROFILE', 'sync')
+if profile not in PROFILES:
+    raise ValueError(f'SERVER_PROFILE must be one of {PROFILES}, not {profile!r}')
+
+tuned = tune(profile, available_cpus(), available_memory_mb())
+
+if profile == 'asgi':
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'config.wsgi:application'
+    worker_class = 'gthread'
+
+workers = _env_int('WEB_CONCURRENCY', tuned['workers'])
+threads = _env_int('GUNICORN_THREADS', tuned['threads'])
+keepalive = _env_int('GUNICORN_KEEPALIVE', tuned['keepalive'])
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', tuned['max_requests'])
+max_requests_jitter = max_requests // 10
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = timeout
+
+# Import Django and the app once in the master so forked workers share those
+# pages copy-on-write and start faster. Nothing opens sockets at import
+# time; the LeetCode clients and DB pools are created per worker.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+# Heartbeat files on tmpfs: a slow overlay disk can stall workers into timeouts
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+
+os.environ['WEB_CONCURRENCY'] = str(workers)
+
+
+def on_starting(server):
+    server.log.info(
+        'profile=%s workers=%s threads=%s keepalive=%ss max_requests=%s+%s preload=%s '
+        '(cpus=%.2f memory=%sMB)',
+        profile, workers, threads, keepalive, max_requests, max_requests_jitter, preload_app,
+        available_cpus(), available_memory_mb(),
+    )
+
+
+def post_fork(server, worker):
+    if preload_app:
+        # Anything the master opened while preloading must not be shared
+        from django.db import connections
+
+        connections.close_all()